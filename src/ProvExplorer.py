@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+##########################################################################
+# ProvExplorer usage notes:
+#
+# 1. Explorers are created with YProv.explore_provenance and walk the
+#    provenance graph of a single goal lazily. Iterating an explorer
+#    yields events of the form
+#      [ "node", node ]      : a new goal, rule or fact node
+#      [ "edge", edge ]      : a new edge
+#      [ "frontier", node ]  : node has children that were not expanded
+#
+# 2. Children are deferred when they lie deeper than maxDepth edges from
+#    the root, or when a goal has more than maxDerivations rule firings
+#    or wildcard resolutions. expand( node ) yields the events for the
+#    deferred children of a frontier node under the same limits.
+#
+# 3. Goals are expanded at most once per explorer. Back-edges are only
+#    detected within a single explore or expand call.
+#
+##########################################################################
+
+# -------------------------------------- #
+import logging, sys
+
+# -------------------------------------- #
+
+class ProvExplorer( object ) :
+
+  ################
+  #  ATTRIBUTES  #
+  ################
+  yp             = None  # pointer to the YProv instance holding the evaluation results
+  rel            = None  # relation of the root goal
+  dataTup        = None  # tuple key of the root goal
+  maxDepth       = None  # maximum number of edges between the root and an expanded node
+  maxDerivations = None  # maximum number of children expanded per goal
+  cycleMode      = None  # back-edge handling, one of YProv.CYCLE_MODES
+  memo           = None  # maps ( relation, tuple key ) pairs to goal nodes
+  frontier       = None  # maps node names to [ node, depth, deferred work items ]
+
+  ##########
+  #  INIT  #
+  ##########
+  def __init__( self, yp, rel, dataTup, maxDepth=None, maxDerivations=None, cycleMode="cut" ) :
+
+    self.yp             = yp
+    self.rel            = rel
+    self.dataTup        = yp.getTupKey( dataTup )
+    self.maxDepth       = maxDepth
+    self.maxDerivations = maxDerivations
+    self.cycleMode      = cycleMode
+    self.memo           = {}
+    self.frontier       = {}
+
+
+  #############
+  #  ITERATE  #
+  #############
+  def __iter__( self ) :
+    return self.explore()
+
+
+  #############
+  #  EXPLORE  #
+  #############
+  # yield the events for the root goal and its descendants, up to the limits.
+  def explore( self ) :
+    return self.walk( [ [ "goal", self.rel, self.dataTup, [] ] ], 0 )
+
+
+  ############
+  #  EXPAND  #
+  ############
+  # yield the events for the deferred children of a frontier node.
+  # node may be a node object or a node name.
+  def expand( self, node ) :
+
+    if hasattr( node, "get_name" ) :
+      node = node.get_name()
+
+    if not node in self.frontier :
+      sys.exit( "ERROR : node '" + str( node ) + "' has no deferred children...aborting" )
+
+    entry = self.frontier.pop( node )
+    logging.debug( "  EXPAND : expanding " + str( len( entry[2] ) ) + " deferred children of " + node )
+
+    return self.walk( entry[2], entry[1] + 1 )
+
+
+  #################
+  #  IS FRONTIER  #
+  #################
+  # return True if the node has deferred children, False otherwise.
+  def isFrontier( self, node ) :
+
+    if hasattr( node, "get_name" ) :
+      node = node.get_name()
+
+    return node in self.frontier
+
+
+  ##########
+  #  WALK  #
+  ##########
+  # depth first traversal over the given work items, which all sit at
+  # the given depth. children beyond the limits are parked in the frontier
+  # of the node that produced them.
+  def walk( self, items, depth ) :
+
+    onPath   = set()
+    worklist = []
+    for item in reversed( items ) :
+      worklist.append( [ item, depth ] )
+
+    while len( worklist ) > 0 :
+      entry = worklist.pop()
+      item  = entry[0]
+      depth = entry[1]
+
+      if item[0] == "exit" :
+        onPath.discard( item[1] )
+        continue
+
+      nodeSet = []
+      edgeSet = []
+      if item[0] == "goal" :
+        children = self.yp.expandGoal( item[1], item[2], item[3], self.memo, nodeSet, edgeSet, onPath, self.cycleMode )
+      else :
+        children = self.yp.expandRule( item[1], item[2], item[3], nodeSet, edgeSet )
+
+      for node in nodeSet :
+        yield [ "node", node ]
+      for edge in edgeSet :
+        yield [ "edge", edge ]
+
+      # +++++++++++++++++++++++++++++++++++++++++++++++++++++ #
+      # split children into expanded and deferred
+
+      exitItems = []
+      if len( children ) > 0 and children[-1][0] == "exit" :
+        exitItems = [ children.pop() ]
+
+      if len( children ) == 0 :
+        continue
+
+      # children of a goal or rule share the node created for it
+      parent = children[0][3][0]
+
+      keep = children
+      if not self.maxDepth is None and depth + 1 > self.maxDepth :
+        keep = []
+      elif not self.maxDerivations is None and item[0] == "goal" :
+        keep = children[ :self.maxDerivations ]
+
+      deferred = children[ len( keep ): ]
+      if len( deferred ) > 0 :
+        self.frontier[ parent.get_name() ] = [ parent, depth, deferred ]
+        yield [ "frontier", parent ]
+
+      # the exit item goes first so it pops after all kept children
+      for child in exitItems + list( reversed( keep ) ) :
+        worklist.append( [ child, depth + 1 ] )
+
+
+#########
+#  EOF  #
+#########
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+##########################################################################
+# ProvExport usage notes:
+#
+# 1. Exporters write a provenance graph to a file path or a file-like
+#    object one node and one edge at a time, so nothing but the node and
+#    edge lists is held in memory. Graphviz is not involved.
+#
+# 2. Built-in formats are "dot" ( Graphviz DOT text ), "jsonl" ( one JSON
+#    object per node and per edge ) and "graphml". New formats are made
+#    available with register( name, extension, exporter ), where exporter
+#    is called as exporter( nodeSet, edgeSet, f ) on a file-like object.
+#
+# 3. Duplicate nodes and edges are written once, as in rendered graphs.
+#
+##########################################################################
+
+# -------------------------------------- #
+import json, logging, sys
+from xml.sax.saxutils import escape, quoteattr
+
+import ProvGraph
+
+# -------------------------------------- #
+
+EXPORTERS = {}  # maps format names to [ file extension, exporter ]
+
+
+############
+#  EXPORT  #
+############
+# write the graph in the given format to target, a path or a file-like object.
+def export( fmt, nodeSet, edgeSet, target ) :
+
+  if not fmt in EXPORTERS :
+    sys.exit( "ERROR : unrecognized export format '" + str( fmt ) + "'...aborting" )
+
+  exporter = EXPORTERS[ fmt ][1]
+  if hasattr( target, "write" ) :
+    exporter( nodeSet, edgeSet, target )
+  else :
+    f = open( target, "w" )
+    try :
+      exporter( nodeSet, edgeSet, f )
+    finally :
+      f.close()
+
+  logging.debug( "  EXPORT : wrote " + str( len( nodeSet ) ) + " nodes, " + str( len( edgeSet ) ) + " edges as " + fmt )
+
+
+###################
+#  GET EXTENSION  #
+###################
+# return the file extension of the given format, e.g. ".jsonl"
+def getExtension( fmt ) :
+
+  if not fmt in EXPORTERS :
+    sys.exit( "ERROR : unrecognized export format '" + str( fmt ) + "'...aborting" )
+
+  return EXPORTERS[ fmt ][0]
+
+
+##############
+#  REGISTER  #
+##############
+def register( name, extension, exporter ) :
+  EXPORTERS[ name ] = [ extension, exporter ]
+
+
+################
+#  EXPORT DOT  #
+################
+def exportDot( nodeSet, edgeSet, f ) :
+
+  f.write( "strict digraph G {\n" )
+
+  for n in uniqueNodes( nodeSet ) :
+    attrs = "shape=" + ProvGraph.NODE_STYLES[ n.nodeType ][1] + ", margin=0.1"
+    if n.nodeType == "aggregate" :
+      attrs = attrs + ", label=" + json.dumps( n.get_label() )
+    f.write( n.get_name() + " [" + attrs + "];\n" )
+
+  for e in uniqueEdges( edgeSet ) :
+    f.write( e.get_source() + " -> " + e.get_destination() + ";\n" )
+
+  f.write( "}\n" )
+
+
+#######################
+#  EXPORT JSON LINES  #
+#######################
+def exportJSONLines( nodeSet, edgeSet, f ) :
+
+  for n in uniqueNodes( nodeSet ) :
+    record = { "type" : "node", \
+               "id" : getId( n ), \
+               "kind" : n.nodeType, \
+               "relation" : n.rel.strip(), \
+               "tuple" : list( n.dataTup ) }
+    if n.nodeType == "aggregate" :
+      record[ "count" ]  = n.count
+      record[ "sample" ] = [ name[ 1:-1 ] for name in n.sample ]
+    f.write( json.dumps( record, sort_keys=True ) + "\n" )
+
+  for e in uniqueEdges( edgeSet ) :
+    record = { "type" : "edge", \
+               "source" : getId( e.src ), \
+               "target" : getId( e.dst ) }
+    f.write( json.dumps( record, sort_keys=True ) + "\n" )
+
+
+####################
+#  EXPORT GRAPHML  #
+####################
+def exportGraphML( nodeSet, edgeSet, f ) :
+
+  f.write( '<?xml version="1.0" encoding="UTF-8"?>\n' )
+  f.write( '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n' )
+  f.write( '  <key id="kind" for="node" attr.name="kind" attr.type="string"/>\n' )
+  f.write( '  <key id="relation" for="node" attr.name="relation" attr.type="string"/>\n' )
+  f.write( '  <key id="count" for="node" attr.name="count" attr.type="int"/>\n' )
+  f.write( '  <graph id="G" edgedefault="directed">\n' )
+
+  for n in uniqueNodes( nodeSet ) :
+    f.write( '    <node id=' + quoteattr( getId( n ) ) + '>' )
+    f.write( '<data key="kind">' + n.nodeType + '</data>' )
+    f.write( '<data key="relation">' + escape( n.rel.strip() ) + '</data>' )
+    if n.nodeType == "aggregate" :
+      f.write( '<data key="count">' + str( n.count ) + '</data>' )
+    f.write( '</node>\n' )
+
+  for e in uniqueEdges( edgeSet ) :
+    f.write( '    <edge source=' + quoteattr( getId( e.src ) ) + ' target=' + quoteattr( getId( e.dst ) ) + '/>\n' )
+
+  f.write( '  </graph>\n' )
+  f.write( '</graphml>\n' )
+
+
+############
+#  GET ID  #
+############
+# node name without the pydot quotes, e.g. 'G_a(0,1)'
+def getId( node ) :
+  return node.get_name()[ 1:-1 ]
+
+
+##################
+#  UNIQUE NODES  #
+##################
+def uniqueNodes( nodeSet ) :
+
+  seen = set()
+  for n in nodeSet :
+    name = n.get_name()
+    if not name in seen :
+      seen.add( name )
+      yield n
+
+
+##################
+#  UNIQUE EDGES  #
+##################
+def uniqueEdges( edgeSet ) :
+
+  seen = set()
+  for e in edgeSet :
+    key = ( e.get_source(), e.get_destination() )
+    if not key in seen :
+      seen.add( key )
+      yield e
+
+
+register( "dot", ".dot", exportDot )
+register( "jsonl", ".jsonl", exportJSONLines )
+register( "graphml", ".graphml", exportGraphML )
+
+
+#########
+#  EOF  #
+#########
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+
+##########################################################################
+# ProvGraph usage notes:
+#
+# 1. Provenance graphs are lists of ProvNode and ProvEdge records.
+#    Records mirror the pydot calls used on them, get_name, get_source
+#    and get_destination, so they can be handled like pydot objects.
+#
+# 2. Node names are built on first use and cached, so traversals which
+#    never look at names never build them. pydot objects are only created
+#    by toDot, when a graph is rendered.
+#
+##########################################################################
+
+# -------------------------------------- #
+import logging, string, sys
+
+# pydot is only needed for rendering.
+try :
+  import pydot
+except ImportError :
+  pydot = None
+
+# -------------------------------------- #
+
+# maps node types to their name prefix and pydot shape
+NODE_STYLES = { "fact"      : [ "F_", "cylinder" ], \
+                "goal"      : [ "G_", "oval" ], \
+                "rule"      : [ "R_", "box" ], \
+                "aggregate" : [ "A_", "folder" ] }
+
+
+##############
+#  PROVNODE  #
+##############
+class ProvNode( object ) :
+
+  __slots__ = [ "nodeType", "rel", "dataTup", "name" ]
+
+  ##########
+  #  INIT  #
+  ##########
+  # nodeType is one of NODE_STYLES, dataTup a tuple key
+  def __init__( self, nodeType, rel, dataTup ) :
+    self.nodeType = nodeType
+    self.rel      = rel
+    self.dataTup  = dataTup
+    self.name     = None
+
+  ##############
+  #  GET NAME  #
+  ##############
+  # return the quoted node name, e.g. '"G_a(0,1)"', as pydot does.
+  def get_name( self ) :
+
+    if self.name is None :
+      label = self.rel + "(" + ",".join( [ str( d ) for d in self.dataTup ] ) + ")"
+
+      # negated relations are labeled 'notin d'
+      if "notin" in label :
+        label = label.replace( "notin", "___NOTIN___" )
+        label = label.translate( None, string.whitespace )
+        label = label.replace( "___NOTIN___", "notin " )
+
+      self.name = '"' + NODE_STYLES[ self.nodeType ][0] + label + '"'
+
+    return self.name
+
+  ##################
+  #  PICKLE STATE  #
+  ##################
+  def __getstate__( self ) :
+    return [ self.nodeType, self.rel, self.dataTup, self.name ]
+
+  def __setstate__( self, state ) :
+    self.nodeType, self.rel, self.dataTup, self.name = state
+
+
+###################
+#  PROVAGGREGATE  #
+###################
+# stands in for count sibling nodes of type memberType in relation rel,
+# all children of the node named parentName. sample holds the names of
+# the first few members.
+class ProvAggregate( ProvNode ) :
+
+  __slots__ = [ "parentName", "memberType", "count", "sample" ]
+
+  ##########
+  #  INIT  #
+  ##########
+  def __init__( self, parentName, memberType, rel, count, sample ) :
+    ProvNode.__init__( self, "aggregate", rel, () )
+    self.parentName = parentName
+    self.memberType = memberType
+    self.count      = count
+    self.sample     = sample
+
+  ##############
+  #  GET NAME  #
+  ##############
+  # e.g. '"A_G_c(_,str2)/G_c"' for the goals of c below G_c(_,str2)
+  def get_name( self ) :
+
+    if self.name is None :
+      self.name = '"A_' + self.parentName[ 1:-1 ] + "/" + NODE_STYLES[ self.memberType ][0] + self.rel.strip() + '"'
+
+    return self.name
+
+  ###############
+  #  GET LABEL  #
+  ###############
+  # e.g. '2 x G_c : G_c(1,str2), ...'
+  def get_label( self ) :
+
+    label = str( self.count ) + " x " + NODE_STYLES[ self.memberType ][0] + self.rel.strip() + " : "
+    label = label + ", ".join( [ name[ 1:-1 ] for name in self.sample ] )
+    if self.count > len( self.sample ) :
+      label = label + ", ..."
+
+    return label
+
+  ##################
+  #  PICKLE STATE  #
+  ##################
+  def __getstate__( self ) :
+    return ProvNode.__getstate__( self ) + [ self.parentName, self.memberType, self.count, self.sample ]
+
+  def __setstate__( self, state ) :
+    ProvNode.__setstate__( self, state[ :4 ] )
+    self.parentName, self.memberType, self.count, self.sample = state[ 4: ]
+
+
+##############
+#  PROVEDGE  #
+##############
+class ProvEdge( object ) :
+
+  __slots__ = [ "src", "dst" ]
+
+  ##########
+  #  INIT  #
+  ##########
+  def __init__( self, src, dst ) :
+    self.src = src
+    self.dst = dst
+
+  ################
+  #  GET SOURCE  #
+  ################
+  def get_source( self ) :
+    return self.src.get_name()
+
+  #####################
+  #  GET DESTINATION  #
+  #####################
+  def get_destination( self ) :
+    return self.dst.get_name()
+
+  ##################
+  #  PICKLE STATE  #
+  ##################
+  def __getstate__( self ) :
+    return [ self.src, self.dst ]
+
+  def __setstate__( self, state ) :
+    self.src, self.dst = state
+
+
+############
+#  TO DOT  #
+############
+# convert the given node and edge records into a strict pydot digraph.
+def toDot( nodeSet, edgeSet ) :
+
+  if pydot is None :
+    sys.exit( "ERROR : rendering provenance graphs depends upon the pydot module.\nPlease install pydot, e.g. 'pip install pydot'\naborting..." )
+
+  graph = pydot.Dot( graph_type = 'digraph', strict=True ) # strict => ignore duplicate edges
+
+  dotNodes = {}
+  for n in nodeSet :
+    getDotNode( n, dotNodes, graph )
+
+  for e in edgeSet :
+    graph.add_edge( pydot.Edge( getDotNode( e.src, dotNodes, graph ), getDotNode( e.dst, dotNodes, graph ) ) )
+
+  logging.debug( "  TO DOT : converted " + str( len( dotNodes ) ) + " nodes" )
+  return graph
+
+
+##################
+#  GET DOT NODE  #
+##################
+# return the pydot node for a node record, adding it to graph on first use.
+def getDotNode( node, dotNodes, graph ) :
+
+  name = node.get_name()
+  if not name in dotNodes :
+    if node.nodeType == "aggregate" :
+      dotNodes[ name ] = pydot.Node( name[ 1:-1 ], shape=NODE_STYLES[ node.nodeType ][1], margin=0.1, label='"' + node.get_label() + '"' )
+    else :
+      dotNodes[ name ] = pydot.Node( name[ 1:-1 ], shape=NODE_STYLES[ node.nodeType ][1], margin=0.1 )
+    graph.add_node( dotNodes[ name ] )
+
+  return dotNodes[ name ]
+
+
+#########
+#  EOF  #
+#########
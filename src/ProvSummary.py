@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+
+##########################################################################
+# ProvSummary usage notes:
+#
+# 1. Summaries are created with YProv.summarize_provenance and sit between
+#    the traversal and the export of a provenance graph. Siblings sharing
+#    a node type and relation, e.g. the goals a wildcard subgoal resolved
+#    to or the firings of one provenance rule, are collapsed into a single
+#    ProvGraph.ProvAggregate node once there are more than maxSiblings of
+#    them. The aggregate carries the member count and a sample of
+#    sampleSize member names.
+#
+# 2. The subtrees below collapsed members are dropped from the summary,
+#    except for nodes still reachable through siblings that stay visible.
+#
+# 3. expand( aggregate ) restores the members of one aggregate and returns
+#    the new summary. collapse( aggregate ) undoes it.
+#
+##########################################################################
+
+# -------------------------------------- #
+import logging, sys
+
+import ProvGraph
+
+# -------------------------------------- #
+
+DEFAULT_SAMPLE_SIZE = 3
+
+class ProvSummary( object ) :
+
+  ################
+  #  ATTRIBUTES  #
+  ################
+  nodeSet     = None  # nodes of the full provenance graph
+  edgeSet     = None  # edges of the full provenance graph
+  maxSiblings = None  # largest sibling group kept visible
+  sampleSize  = None  # number of member names sampled per aggregate
+  expanded    = None  # names of the aggregates whose members are visible
+  aggregates  = None  # maps aggregate names to [ aggregate, member nodes ]
+
+  ##########
+  #  INIT  #
+  ##########
+  def __init__( self, nodeSet, edgeSet, maxSiblings, sampleSize=DEFAULT_SAMPLE_SIZE ) :
+
+    if maxSiblings < 1 :
+      sys.exit( "ERROR : maxSiblings must be at least 1, got '" + str( maxSiblings ) + "'...aborting" )
+
+    self.nodeSet     = nodeSet
+    self.edgeSet     = edgeSet
+    self.maxSiblings = maxSiblings
+    self.sampleSize  = sampleSize
+    self.expanded    = set()
+    self.aggregates  = {}
+
+
+  ###########
+  #  GRAPH  #
+  ###########
+  # return the [ nodeSet, edgeSet ] of the summarized graph.
+  # nodes are listed in traversal order from the roots of the full graph.
+  def graph( self ) :
+
+    nodes    = {}
+    order    = []
+    children = {}
+    inDegree = {}
+    for n in self.nodeSet :
+      if not n.get_name() in nodes :
+        nodes[ n.get_name() ] = n
+        order.append( n.get_name() )
+    seen     = set()
+    for e in self.edgeSet :
+      key = ( e.get_source(), e.get_destination() )
+      if not key in seen :
+        seen.add( key )
+        children.setdefault( key[0], [] ).append( e.dst )
+        inDegree[ key[1] ] = inDegree.get( key[1], 0 ) + 1
+
+    roots = [ name for name in order if inDegree.get( name, 0 ) == 0 ]
+    if len( roots ) == 0 and len( order ) > 0 :
+      roots = [ order[0] ]
+
+    # --------------------------------- #
+    # walk down from the roots, replacing large sibling groups
+
+    nodeSet  = []
+    edgeSet  = []
+    visited  = set()
+    worklist = [ nodes[ name ] for name in reversed( roots ) ]
+    while len( worklist ) > 0 :
+      node = worklist.pop()
+      if node.get_name() in visited :
+        continue
+      visited.add( node.get_name() )
+      nodeSet.append( node )
+
+      pending = []
+      for group in self.getSiblingGroups( children.get( node.get_name(), [] ) ) :
+        aggregate = None
+        if len( group ) > self.maxSiblings :
+          aggregate = self.getAggregate( node, group )
+
+        if aggregate is None or aggregate.get_name() in self.expanded :
+          for child in group :
+            edgeSet.append( ProvGraph.ProvEdge( node, child ) )
+            pending.append( child )
+        else :
+          nodeSet.append( aggregate )
+          edgeSet.append( ProvGraph.ProvEdge( node, aggregate ) )
+
+      worklist.extend( reversed( pending ) )
+
+    logging.debug( "  GRAPH : summarized " + str( len( self.nodeSet ) ) + " nodes into " + str( len( nodeSet ) ) )
+    return [ nodeSet, edgeSet ]
+
+
+  ############
+  #  EXPAND  #
+  ############
+  # show the members of the given aggregate node, or aggregate name, and
+  # return the new summarized graph.
+  def expand( self, aggregate ) :
+
+    self.expanded.add( self.getAggregateName( aggregate ) )
+    return self.graph()
+
+
+  ##############
+  #  COLLAPSE  #
+  ##############
+  # hide the members of an expanded aggregate again and return the new
+  # summarized graph.
+  def collapse( self, aggregate ) :
+
+    self.expanded.discard( self.getAggregateName( aggregate ) )
+    return self.graph()
+
+
+  #################
+  #  GET MEMBERS  #
+  #################
+  # return the nodes collapsed into the given aggregate
+  def getMembers( self, aggregate ) :
+    return self.aggregates[ self.getAggregateName( aggregate ) ][1]
+
+
+  ########################
+  #  GET SIBLING GROUPS  #
+  ########################
+  # split the children of a node into groups of the same node type and
+  # relation, keeping the order of first appearance.
+  def getSiblingGroups( self, children ) :
+
+    groups = {}
+    keys   = []
+    for child in children :
+      key = ( child.nodeType, child.rel.strip() )
+      if not key in groups :
+        groups[ key ] = []
+        keys.append( key )
+      groups[ key ].append( child )
+
+    return [ groups[ key ] for key in keys ]
+
+
+  ###################
+  #  GET AGGREGATE  #
+  ###################
+  # return the aggregate standing in for the group of siblings below parent.
+  # aggregates are created once, so repeated summaries hand out the same node.
+  def getAggregate( self, parent, group ) :
+
+    aggregate = ProvGraph.ProvAggregate( parent.get_name(), group[0].nodeType, group[0].rel, len( group ), \
+                                         [ n.get_name() for n in group[ :self.sampleSize ] ] )
+    name      = aggregate.get_name()
+
+    if not name in self.aggregates :
+      self.aggregates[ name ] = [ aggregate, group ]
+
+    return self.aggregates[ name ][0]
+
+
+  ########################
+  #  GET AGGREGATE NAME  #
+  ########################
+  def getAggregateName( self, aggregate ) :
+
+    if isinstance( aggregate, ProvGraph.ProvAggregate ) :
+      name = aggregate.get_name()
+    else :
+      name = aggregate
+
+    if not name in self.aggregates :
+      sys.exit( "ERROR : unrecognized aggregate node '" + str( name ) + "'...aborting" )
+
+    return name
+
+
+#########
+#  EOF  #
+#########
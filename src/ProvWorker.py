@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+##########################################################################
+# ProvWorker usage notes:
+#
+# 1. Worker processes are forked by YProv.get_prov_tree_parallel and
+#    read the YProv instance stored in SNAPSHOT. Forking shares the
+#    parent's result store and indexes copy-on-write, so nothing but the
+#    work items and the partial graphs are pickled.
+#
+##########################################################################
+
+# -------------------------------------- #
+import logging
+
+# -------------------------------------- #
+
+SNAPSHOT = None  # YProv instance set by the parent before the pool forks
+
+####################
+#  EXPAND SUBTREE  #
+####################
+# expand one work item in a worker process and return its [ nodeSet, edgeSet ].
+# ancestorNodes maps the keys of the goals above the item to their nodes,
+# so back-edges are detected as in a sequential traversal.
+def expandSubtree( item, ancestorNodes, cycleMode ) :
+
+  nodeSet = []
+  edgeSet = []
+  memo    = dict( ancestorNodes )
+  onPath  = set( ancestorNodes.keys() )
+
+  logging.debug( "  EXPAND SUBTREE : item = " + str( item[:3] ) )
+  SNAPSHOT.walkProvTree( [ item ], memo, onPath, nodeSet, edgeSet, cycleMode )
+
+  return [ nodeSet, edgeSet ]
+
+
+#########
+#  EOF  #
+#########
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+##########################################################################
+# RenderPool usage notes:
+#
+# 1. A RenderPool renders provenance graphs to png files in the
+#    background. YProv.setRenderPool attaches a pool, after which
+#    generate_provenance and generate_provenance_batch return as soon as
+#    the graph is built and queue the render as a job.
+#
+# 2. At most maxPending jobs are queued or running. submit blocks until
+#    a slot frees up, so producers cannot outrun the renderers.
+#
+# 3. Jobs render on threads by default, which suits the Graphviz
+#    subprocess doing the work. processes=True renders on worker
+#    processes instead, which pickles the graphs.
+#
+# 4. Depends upon concurrent.futures ( 'pip install futures' on python 2 ).
+#
+##########################################################################
+
+# -------------------------------------- #
+import logging, sys, threading
+
+try :
+  import concurrent.futures
+except ImportError :
+  concurrent = None
+
+import ProvGraph
+
+# -------------------------------------- #
+
+class RenderPool( object ) :
+
+  ################
+  #  ATTRIBUTES  #
+  ################
+  executor = None  # concurrent.futures executor running the jobs
+  slots    = None  # semaphore bounding the number of queued and running jobs
+  jobs     = None  # list of submitted RenderJobs, in submission order
+
+  ##########
+  #  INIT  #
+  ##########
+  def __init__( self, workers=2, maxPending=8, processes=False ) :
+
+    if concurrent is None :
+      raise ImportError( "background rendering depends upon the concurrent.futures module. On python 2, please install the futures backport, e.g. 'pip install futures'" )
+
+    if processes :
+      self.executor = concurrent.futures.ProcessPoolExecutor( max_workers=workers )
+    else :
+      self.executor = concurrent.futures.ThreadPoolExecutor( max_workers=workers )
+
+    self.slots = threading.BoundedSemaphore( maxPending )
+    self.jobs  = []
+
+
+  ############
+  #  SUBMIT  #
+  ############
+  # queue a render of the graph to savePath + ".png" and return its RenderJob.
+  # blocks while maxPending jobs are queued or running.
+  def submit( self, nodeSet, edgeSet, savePath ) :
+
+    self.slots.acquire()
+    try :
+      future = self.executor.submit( renderFile, nodeSet, edgeSet, savePath )
+    except :
+      self.slots.release()
+      raise
+
+    future.add_done_callback( lambda f : self.slots.release() )
+
+    job = RenderJob( savePath, future )
+    self.jobs.append( job )
+    logging.debug( "  SUBMIT : queued render of " + savePath )
+
+    return job
+
+
+  ################
+  #  GET STATUS  #
+  ################
+  # return one [ savePath, status, error ] entry per submitted job.
+  def getStatus( self ) :
+    return [ [ job.savePath, job.status(), job.error() ] for job in self.jobs ]
+
+
+  ##########
+  #  WAIT  #
+  ##########
+  # block until every submitted job finished. returns getStatus().
+  def wait( self ) :
+    concurrent.futures.wait( [ job.future for job in self.jobs ] )
+    return self.getStatus()
+
+
+  ##############
+  #  SHUTDOWN  #
+  ##############
+  # finish the submitted jobs and stop the workers.
+  def shutdown( self ) :
+    self.executor.shutdown( wait=True )
+
+
+###############
+#  RENDERJOB  #
+###############
+# a queued render
+class RenderJob( object ) :
+
+  ################
+  #  ATTRIBUTES  #
+  ################
+  savePath = None  # the png is written to savePath + ".png"
+  future   = None  # concurrent.futures future of the job
+
+  ##########
+  #  INIT  #
+  ##########
+  def __init__( self, savePath, future ) :
+    self.savePath = savePath
+    self.future   = future
+
+  ############
+  #  STATUS  #
+  ############
+  # one of "pending", "running", "done" or "failed"
+  def status( self ) :
+
+    if self.future.running() :
+      return "running"
+    elif not self.future.done() :
+      return "pending"
+    elif self.future.exception() is None :
+      return "done"
+    else :
+      return "failed"
+
+  ###########
+  #  ERROR  #
+  ###########
+  # error message of a failed job, None otherwise
+  def error( self ) :
+
+    if not self.future.done() or self.future.exception() is None :
+      return None
+
+    e = self.future.exception()
+    if isinstance( e, SystemExit ) :
+      return str( e.code )
+    return str( e )
+
+  ############
+  #  RESULT  #
+  ############
+  # block until the job finished and return the path of the png file
+  def result( self, timeout=None ) :
+    return self.future.result( timeout )
+
+
+#################
+#  RENDER FILE  #
+#################
+# render the graph to savePath + ".png". runs on the pool workers.
+def renderFile( nodeSet, edgeSet, savePath ) :
+
+  graph = ProvGraph.toDot( nodeSet, edgeSet )
+  graph.write_png( savePath + ".png" )
+
+  return savePath + ".png"
+
+
+#########
+#  EOF  #
+#########
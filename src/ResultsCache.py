@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+##########################################################################
+# ResultsCache usage notes:
+#
+# 1. A ResultsCache keeps evaluation results on disk, one cPickle file per
+#    key in the cache directory. YProv.setCache attaches a cache, and
+#    YProv.run then reuses the results stored for the same program and
+#    database contents instead of evaluating the program again.
+#
+# 2. Entries are evicted least recently used first once the files in the
+#    cache directory exceed maxSize bytes. reading an entry marks it used.
+#
+##########################################################################
+
+# -------------------------------------- #
+import cPickle, logging, os, tempfile
+
+# -------------------------------------- #
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024  # bytes
+ENTRY_SUFFIX     = ".cache"
+
+class ResultsCache( object ) :
+
+  ################
+  #  ATTRIBUTES  #
+  ################
+  cacheDir = None  # directory holding the cache entries
+  maxSize  = None  # maximum total size of the cache entries in bytes
+
+  ##########
+  #  INIT  #
+  ##########
+  def __init__( self, cacheDir, maxSize=DEFAULT_MAX_SIZE ) :
+
+    self.cacheDir = cacheDir
+    self.maxSize  = maxSize
+
+    if not os.path.isdir( cacheDir ) :
+      os.makedirs( cacheDir )
+
+
+  #########
+  #  GET  #
+  #########
+  # return the data stored under key, or None on a miss.
+  def get( self, key ) :
+
+    path = self.getEntryPath( key )
+    try :
+      f = open( path, "rb" )
+    except IOError :
+      logging.debug( "  GET : cache miss for key " + key )
+      return None
+
+    try :
+      data = cPickle.load( f )
+    except Exception :
+      logging.debug( "  GET : dropping unreadable cache entry " + path )
+      f.close()
+      os.remove( path )
+      return None
+    f.close()
+
+    os.utime( path, None )
+    logging.debug( "  GET : cache hit for key " + key )
+    return data
+
+
+  #########
+  #  PUT  #
+  #########
+  # store data under key, then evict older entries beyond maxSize.
+  # entries are written to a temporary file first, so readers never
+  # see a partial entry.
+  def put( self, key, data ) :
+
+    path        = self.getEntryPath( key )
+    fd, tmpPath = tempfile.mkstemp( dir=self.cacheDir )
+    f           = os.fdopen( fd, "wb" )
+    cPickle.dump( data, f, cPickle.HIGHEST_PROTOCOL )
+    f.close()
+    os.rename( tmpPath, path )
+
+    logging.debug( "  PUT : cached " + str( os.path.getsize( path ) ) + " bytes for key " + key )
+    self.evict( path )
+
+
+  ###########
+  #  EVICT  #
+  ###########
+  # remove the least recently used entries until the cache fits in maxSize.
+  # the entry at keepPath is never removed.
+  def evict( self, keepPath=None ) :
+
+    entries = []
+    total   = 0
+    for name in os.listdir( self.cacheDir ) :
+      if not name.endswith( ENTRY_SUFFIX ) :
+        continue
+      path = os.path.join( self.cacheDir, name )
+      stat = os.stat( path )
+      entries.append( [ stat.st_mtime, path, stat.st_size ] )
+      total += stat.st_size
+
+    entries.sort()
+    for entry in entries :
+      if total <= self.maxSize :
+        break
+      if entry[1] == keepPath :
+        continue
+      os.remove( entry[1] )
+      total -= entry[2]
+      logging.debug( "  EVICT : evicted cache entry " + entry[1] )
+
+
+  ####################
+  #  GET ENTRY PATH  #
+  ####################
+  def getEntryPath( self, key ) :
+    return os.path.join( self.cacheDir, key + ENTRY_SUFFIX )
+
+
+#########
+#  EOF  #
+#########
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+##########################################################################
+# Rule usage notes:
+#
+# 1. A Rule is the compiled form of a single c4 datalog rule string.
+#    The string is tokenized exactly once, in the constructor.
+#
+# 2. Negated subgoals keep the ' notin <name>' form produced by
+#    YProv.getBody, so node labels and relation lookups are unchanged.
+#
+# 3. Subgoals over hidden relations, e.g. the magic guards added by
+#    YProv.run_goal_directed, stay in the body signature, so they are
+#    evaluated, but are left out of subgoals and subgoalMaps.
+#
+##########################################################################
+
+# -------------------------------------- #
+import string
+
+# -------------------------------------- #
+
+class Rule( object ) :
+
+  ################
+  #  ATTRIBUTES  #
+  ################
+  query       = None  # the original c4 query string
+  goalName    = None  # name of the goal relation
+  goalAtts    = None  # list of goal attributes
+  body        = None  # body signature, e.g. 'b(X,Y), notin d(X,Y)'
+  subgoals    = None  # list of [ subName, subAttList, isNegated ]
+  subgoalMaps = None  # list of [ subName, list of goal attribute positions ]
+
+  ##########
+  #  INIT  #
+  ##########
+  def __init__( self, query, hidden=None ) :
+
+    self.query = query
+
+    # --------------------------------- #
+    # goal name and goal attributes
+
+    head          = query.translate( None, string.whitespace )
+    head          = head.split( ":-" )
+    head          = head[0]
+    head          = head.split( "(" )
+    self.goalName = head[0]
+    self.goalAtts = head[1].replace( ")", "" ).split( "," )
+
+    # --------------------------------- #
+    # body signature
+
+    body      = query.replace( "notin", "___NOTIN___" )
+    body      = body.replace( ";", "" )
+    body      = body.translate( None, string.whitespace )
+    body      = body.split( ":-" )
+    body      = body[1]
+    body      = body.replace( "___NOTIN___", " notin " )
+    self.body = body
+
+    # --------------------------------- #
+    # subgoals
+
+    self.subgoals = []
+    for sub in self.body.split( ")," ) :
+      data       = sub.replace( ")", "" )
+      data       = data.split( "(" )
+      subName    = data[0]
+      subAttList = data[1].split( "," )
+      if not hidden is None and subName in hidden :
+        continue
+      self.subgoals.append( [ subName, subAttList, "notin" in subName ] )
+
+    # --------------------------------- #
+    # map subgoal attributes onto goal attribute positions.
+    # wildcards and attributes missing from the goal map to None.
+
+    positions = {}
+    for i in range( 0, len( self.goalAtts ) ) :
+      att = self.goalAtts[ i ]
+      if not att in positions :
+        positions[ att ] = i
+
+    self.subgoalMaps = []
+    for sub in self.subgoals :
+      subPositions = []
+      for att in sub[1] :
+        if att == "_" :
+          subPositions.append( None )
+        else :
+          subPositions.append( positions.get( att ) )
+      self.subgoalMaps.append( [ sub[0], subPositions ] )
+
+
+#########
+#  EOF  #
+#########
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+##########################################################################
+# Semiring usage notes:
+#
+# 1. A Semiring annotates edb facts and combines annotations along the
+#    provenance rules : times joins the subgoals of one rule firing and
+#    plus merges the alternative firings of a goal. YProv.annotate_provenance
+#    evaluates a semiring bottom-up over the _prov relations.
+#
+# 2. Facts are identified by ( relation, tuple key ) pairs. Negated subgoals
+#    are annotated with one.
+#
+# 3. New semirings subclass Semiring and are made available by name with
+#    register( name, semiring ). Semirings with an idempotent plus are
+#    evaluated to a fixpoint on recursive relations, the others only when
+#    every tuple has finitely many derivations.
+#
+##########################################################################
+
+# -------------------------------------- #
+import logging, sys
+
+# -------------------------------------- #
+
+SEMIRINGS = {}  # maps semiring names to Semiring instances
+
+
+class Semiring( object ) :
+
+  ################
+  #  ATTRIBUTES  #
+  ################
+  idempotent = False  # True if plus( a, a ) == a
+
+  ##########
+  #  ZERO  #
+  ##########
+  # annotation of a tuple without derivations
+  def zero( self ) :
+    sys.exit( "ERROR : semiring '" + self.__class__.__name__ + "' does not define zero...aborting" )
+
+  #########
+  #  ONE  #
+  #########
+  # annotation of the empty join, e.g. a negated subgoal
+  def one( self ) :
+    sys.exit( "ERROR : semiring '" + self.__class__.__name__ + "' does not define one...aborting" )
+
+  ##########
+  #  PLUS  #
+  ##########
+  # combine the annotations of alternative derivations
+  def plus( self, a, b ) :
+    sys.exit( "ERROR : semiring '" + self.__class__.__name__ + "' does not define plus...aborting" )
+
+  ###########
+  #  TIMES  #
+  ###########
+  # combine the annotations of jointly used subgoals
+  def times( self, a, b ) :
+    sys.exit( "ERROR : semiring '" + self.__class__.__name__ + "' does not define times...aborting" )
+
+  ##########
+  #  FACT  #
+  ##########
+  # annotation of the edb fact ( rel, dataTup )
+  def fact( self, rel, dataTup ) :
+    sys.exit( "ERROR : semiring '" + self.__class__.__name__ + "' does not define fact...aborting" )
+
+
+######################
+#  LINEAGE SEMIRING  #
+######################
+# annotations are the sets of edb facts contributing to a tuple.
+# zero is None, so tuples without derivations differ from empty lineage.
+class LineageSemiring( Semiring ) :
+
+  idempotent = True
+
+  def zero( self ) :
+    return None
+
+  def one( self ) :
+    return frozenset()
+
+  def plus( self, a, b ) :
+    if a is None :
+      return b
+    if b is None :
+      return a
+    return a | b
+
+  def times( self, a, b ) :
+    if a is None or b is None :
+      return None
+    return a | b
+
+  def fact( self, rel, dataTup ) :
+    return frozenset( [ ( rel, dataTup ) ] )
+
+
+##################
+#  WHY SEMIRING  #
+##################
+# annotations are sets of witnesses, each witness a set of edb facts
+# which together derive the tuple.
+class WhySemiring( Semiring ) :
+
+  idempotent = True
+
+  def zero( self ) :
+    return frozenset()
+
+  def one( self ) :
+    return frozenset( [ frozenset() ] )
+
+  def plus( self, a, b ) :
+    return a | b
+
+  def times( self, a, b ) :
+    return frozenset( [ x | y for x in a for y in b ] )
+
+  def fact( self, rel, dataTup ) :
+    return frozenset( [ frozenset( [ ( rel, dataTup ) ] ) ] )
+
+
+#########################
+#  POLYNOMIAL SEMIRING  #
+#########################
+# annotations are provenance polynomials over the edb facts, as dicts
+# mapping monomials to coefficients. a monomial is a sorted tuple of
+# ( fact, exponent ) pairs.
+class PolynomialSemiring( Semiring ) :
+
+  def zero( self ) :
+    return {}
+
+  def one( self ) :
+    return { () : 1 }
+
+  def plus( self, a, b ) :
+    poly = dict( a )
+    for mono in b :
+      poly[ mono ] = poly.get( mono, 0 ) + b[ mono ]
+    return poly
+
+  def times( self, a, b ) :
+    poly = {}
+    for monoA in a :
+      for monoB in b :
+        powers = dict( monoA )
+        for var, exp in monoB :
+          powers[ var ] = powers.get( var, 0 ) + exp
+        mono         = tuple( sorted( powers.items() ) )
+        poly[ mono ] = poly.get( mono, 0 ) + a[ monoA ] * b[ monoB ]
+    return poly
+
+  def fact( self, rel, dataTup ) :
+    return { ( ( ( rel, dataTup ), 1 ), ) : 1 }
+
+
+#######################
+#  COUNTING SEMIRING  #
+#######################
+# annotations are the numbers of derivation trees.
+class CountingSemiring( Semiring ) :
+
+  def zero( self ) :
+    return 0
+
+  def one( self ) :
+    return 1
+
+  def plus( self, a, b ) :
+    return a + b
+
+  def times( self, a, b ) :
+    return a * b
+
+  def fact( self, rel, dataTup ) :
+    return 1
+
+
+##############
+#  REGISTER  #
+##############
+# make semiring available to YProv.annotate_provenance under name.
+def register( name, semiring ) :
+
+  if not isinstance( semiring, Semiring ) :
+    sys.exit( "ERROR : '" + str( semiring ) + "' is not a Semiring instance...aborting" )
+
+  SEMIRINGS[ name ] = semiring
+  logging.debug( "  REGISTER : registered semiring '" + name + "'" )
+
+
+#########
+#  GET  #
+#########
+# return the semiring registered under name.
+# Semiring instances are returned unchanged.
+def get( name ) :
+
+  if isinstance( name, Semiring ) :
+    return name
+
+  if not name in SEMIRINGS :
+    sys.exit( "ERROR : unrecognized semiring '" + str( name ) + "'...aborting" )
+
+  return SEMIRINGS[ name ]
+
+
+register( "lineage", LineageSemiring() )
+register( "why", WhySemiring() )
+register( "polynomial", PolynomialSemiring() )
+register( "counting", CountingSemiring() )
+
+
+#########
+#  EOF  #
+#########
@@ -9,9 +9,11 @@ Test_yprov.py
 #  IMPORTS  #
 #############
 # standard python packages
-import inspect, logging, os, pickledb, sqlite3, sys, unittest
+import inspect, json, logging, os, pickledb, shutil, sqlite3, sys, tempfile, unittest
 from StringIO import StringIO
 
+import ProvExport
+import ProvGraph
 import YProv
 
 
@@ -27,6 +29,1697 @@ class Test_yprov( unittest.TestCase ) :
   #logging.basicConfig( format='%(levelname)s:%(message)s', level=logging.INFO )
 
 
+  ################
+  #  EXAMPLE 29  #
+  ################
+  # tests cheapest derivation search over wide wildcard fan-out
+  def test_example29( self ) :
+
+    test_id = "test_example29"
+    width   = 5
+    fanout  = 10
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    for i in range( 0, width ) :
+      dbInst.set( "b" + str( i ), [ [ "x" ], range( 0, fanout ) ] )
+      yp.setSchema( "b" + str( i ), [ "string", "int" ] )
+    yp.setSchema( "a", [ "string" ] )
+
+    # set original query
+    query = "a(X) :- " + ", ".join( [ "b" + str( i ) + "(X,_)" for i in range( 0, width ) ] ) + " ;"
+    yp.setQuery( query )
+    logging.debug( "  " + test_id + " : set query '" + query + "' to db instance." )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # test 0 : one fact per wildcard subgoal, without enumerating the
+    # fanout ** width combinations
+    logging.debug( "  " + test_id + " : calling 'find_cheapest_derivations' on YProv instance." )
+    derivations = yp.find_cheapest_derivations( "a", [ "x" ], 3 )
+    self.assertEqual( [ d[0] for d in derivations ], [ width ] * 3 )
+    self.assertEqual( len( set( [ d[1] for d in derivations ] ) ), 3 )
+    for d in derivations :
+      self.assertEqual( sorted( [ fact[0] for fact in d[1] ] ), [ "b" + str( i ) for i in range( 0, width ) ] )
+
+    # test 1 : costs only change the total
+    witness = yp.find_minimal_witness( "a", [ "x" ], { "b0":4 } )
+    self.assertEqual( len( witness ), width )
+    self.assertEqual( yp.find_cheapest_derivations( "a", [ "x" ], 1, { "b0":4 } )[0][0], width + 3 )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ################
+  #  EXAMPLE 28  #
+  ################
+  # tests annotating a long recursive chain and a cycle of goals
+  def test_example28( self ) :
+
+    test_id = "test_example28"
+    depth   = 200
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    chain = dict( [ ( "n" + str( i ), "n" + str( i + 1 ) ) for i in range( 0, depth ) ] )
+    ring  = { "a":"b", "b":"c", "c":"a" }
+
+    for edges in [ chain, ring ] :
+      dbInst.set( "edge", edges )
+
+      # ------------------------------------------------------------- #
+      yp = YProv.YProv( "pickledb", dbInst )
+      logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+      # set original queries
+      query1 = "c(X) :- edge(X,_) ;"
+      yp.setQuery( query1 )
+      logging.debug( "  " + test_id + " : set query '" + query1 + "' to db instance." )
+
+      query2 = "c(Y) :- c(X), edge(X,Y) ;"
+      yp.setQuery( query2 )
+      logging.debug( "  " + test_id + " : set query '" + query2 + "' to db instance." )
+
+      schema = { "c":["string"], "edge":["string","string"] }
+
+      for rel in schema :
+        yp.setSchema( rel, schema[rel] )
+        logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+      # ------------------------------------------------------------- #
+      # test evaluation results
+      logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+      allProgramData = yp.run()
+
+      if edges is chain :
+        # test 0 : c(ni) has one derivation per node up to ni
+        counts = yp.annotate_provenance( "counting" )[ "c" ]
+        self.assertEqual( counts[ ( "n0", ) ], 1 )
+        self.assertEqual( counts[ ( "n" + str( depth - 1 ), ) ], depth )
+        self.assertEqual( counts[ ( "n" + str( depth ), ) ], depth )
+
+        # test 1 : lineage of the last node holds every edge
+        lineage = yp.annotate_provenance( "lineage" )[ "c" ][ ( "n" + str( depth ), ) ]
+        self.assertEqual( len( lineage ), depth )
+
+      else :
+        # test 2 : the goals on the ring converge in idempotent semirings
+        edgeFacts = frozenset( [ ( "edge", ( x, ring[ x ] ) ) for x in ring ] )
+        self.assertEqual( yp.annotate_provenance( "lineage" )[ "c" ], \
+                          { ( "a", ) : edgeFacts, ( "b", ) : edgeFacts, ( "c", ) : edgeFacts } )
+        self.assertEqual( yp.annotate_provenance( "why" )[ "c" ][ ( "a", ) ], \
+                          frozenset( [ frozenset( [ ( "edge", ( "a", "b" ) ) ] ), \
+                                       frozenset( [ ( "edge", ( "c", "a" ) ) ] ), \
+                                       frozenset( [ ( "edge", ( "b", "c" ) ), ( "edge", ( "c", "a" ) ) ] ), \
+                                       edgeFacts ] ) )
+
+        # test 3 : but have infinitely many derivations
+        with self.assertRaises( SystemExit ) as cm :
+          yp.annotate_provenance( "counting" )
+        self.assertEqual( cm.exception.code, "ERROR : tuples of the recursive relations ['c'] have infinitely many derivations in semiring 'CountingSemiring'...aborting" )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ################
+  #  EXAMPLE 27  #
+  ################
+  # tests incremental maintenance of a relation used under negation when
+  # provenance is declared for the negating relation only
+  def test_example27( self ) :
+
+    test_id = "test_example27"
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "b", { "p":"q", "r":"s" } )
+    dbInst.set( "e", { "r":"s" } )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original queries
+    query1 = "a(X,Y) :- b(X,Y), notin d(X,Y) ;"
+    yp.setQuery( query1 )
+    logging.debug( "  " + test_id + " : set query '" + query1 + "' to db instance." )
+
+    query2 = "d(X,Y) :- e(X,Y) ;"
+    yp.setQuery( query2 )
+    logging.debug( "  " + test_id + " : set query '" + query2 + "' to db instance." )
+
+    schema = { "a":["string","string"], "b":["string","string"], "d":["string","string"], "e":["string","string"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    yp.setProvenanceRelations( [ "a" ] )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # test 0 : d is only used under negation, but still gets provenance rules
+    self.assertTrue( "d_prov1" in yp.getSchema() )
+    self.assertEqual( yp.final_results_dict[ "a" ], [ ( "p", "q" ) ] )
+
+    # test 1 : deleting e(r,s) removes d(r,s) and so derives a(r,s)
+    logging.debug( "  " + test_id + " : calling 'update_provenance' on YProv instance." )
+    changes = yp.update_provenance( deletes={ "e":[ [ "r", "s" ] ] } )
+
+    self.assertEqual( changes[ "d" ], [ [], [ ( "r", "s" ) ] ] )
+    self.assertEqual( changes[ "a" ], [ [ ( "r", "s" ) ], [] ] )
+    self.assertEqual( sorted( yp.final_results_dict[ "a" ] ), [ ( "p", "q" ), ( "r", "s" ) ] )
+
+    # test 2 : inserting e(p,q) derives d(p,q) and so removes a(p,q)
+    changes = yp.update_provenance( inserts={ "e":[ [ "p", "q" ] ] } )
+
+    self.assertEqual( changes[ "a" ], [ [], [ ( "p", "q" ) ] ] )
+    self.assertEqual( yp.final_results_dict[ "a" ], [ ( "r", "s" ) ] )
+    self.assertFalse( yp.verifyRelTup( "a", [ "p", "q" ] ) )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ################
+  #  EXAMPLE 26  #
+  ################
+  # tests that a failed batch target leaves no memoized goals behind
+  def test_example26( self ) :
+
+    test_id = "test_example26"
+    saveDir = tempfile.mkdtemp()
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "b", [ 0, [ "str1", "str2" ] ] )
+    dbInst.set( "c", [ [ 1, 2 ], [ "str2", "str3" ] ] )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original query
+    query = "a(X,Y) :- b(_,X), c(_,Y) ;"
+    yp.setQuery( query )
+    logging.debug( "  " + test_id + " : set query '" + query + "' to db instance." )
+
+    schema = { "a":["string","string"], "b":["int","string"],"c":["int","string"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # fail the first target once c(_,str2), which it shares with the
+    # second target, is memoized.
+    resolveWildcards = yp.resolveWildcards
+    def failOnB( rel, dataTup ) :
+      if rel == "b" and dataTup == ( "_", "str1" ) :
+        sys.exit( "ERROR : injected failure" )
+      return resolveWildcards( rel, dataTup )
+    yp.resolveWildcards = failOnB
+
+    targets = [ [ "a", [ "str1", "str2" ] ], [ "a", [ "str2", "str2" ] ] ]
+    results = yp.generate_provenance_batch( targets, saveDir + "/" + test_id, render=False )
+
+    self.assertEqual( results[0][2:], [ None, "ERROR : injected failure", None ] )
+    self.assertEqual( results[1][3], None )
+
+    # the second target expands c(_,str2) itself
+    names = [ n.get_name() for n in results[1][2][0] ]
+    self.assertEqual( sorted( names ), sorted( [ '"G_a(str2,str2)"', '"R_a_prov0(str2,str2)"', '"G_c(_,str2)"', '"G_c(1,str2)"', '"F_c(1,str2)"', \
+                                                 '"G_c(2,str2)"', '"F_c(2,str2)"', '"G_b(_,str2)"', '"G_b(0,str2)"', '"F_b(0,str2)"' ] ) )
+
+    # ---------------------------- #
+    dbInst.deldb()
+    shutil.rmtree( saveDir )
+
+
+  ################
+  #  EXAMPLE 25  #
+  ################
+  # tests a derivation deeper than the python recursion limit
+  def test_example25( self ) :
+
+    test_id = "test_example25"
+    depth   = sys.getrecursionlimit() + 10
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "r" + str( depth ), [ 7 ] )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original queries, a chain r0 <- r1 <- ... <- r<depth>
+    for i in reversed( range( 0, depth ) ) :
+      yp.setQuery( "r" + str( i ) + "(X) :- r" + str( i + 1 ) + "(X) ;" )
+
+    for i in range( 0, depth + 1 ) :
+      yp.setSchema( "r" + str( i ), [ "int" ] )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # one goal and one rule node per level, plus the edb goal and fact
+    graphData = yp.get_prov_tree( "r0", [ "7" ], [] )
+    self.assertEqual( len( graphData[0] ), 2 * depth + 2 )
+    self.assertEqual( len( graphData[1] ), 2 * depth + 1 )
+    self.assertEqual( graphData[0][-1].get_name(), '"F_r' + str( depth ) + '(7)"' )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ################
+  #  EXAMPLE 24  #
+  ################
+  # tests parsing evaluation output with empty relations and stray lines
+  def test_example24( self ) :
+
+    test_id = "test_example24"
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # --------------------------------------------------------------- #
+    # data lines before the first separator belong to no relation,
+    # relations without records map to empty lists.
+    results = [ "0,1", \
+                "---------------------------", \
+                "a", \
+                "0,1", \
+                "'str1', 'str2'", \
+                "0,1", \
+                "---------------------------", \
+                "empty", \
+                "---------------------------", \
+                "b", \
+                "", \
+                "5" ]
+
+    resultsDict = yp.getResultsDict( results )
+    self.assertEqual( resultsDict, { "a" : [ ( "0", "1" ), ( "str1", "str2" ) ], "empty" : [], "b" : [ ( "5", ) ] } )
+    self.assertEqual( yp.getResultsSets( resultsDict ), { "a" : set( [ ( "0", "1" ), ( "str1", "str2" ) ] ), "empty" : set(), "b" : set( [ ( "5", ) ] ) } )
+
+    # parsing has no side effects on the instance
+    self.assertTrue( yp.final_results_sets is None )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ################
+  #  EXAMPLE 23  #
+  ################
+  # tests resolving wildcard subgoals with several bound columns
+  def test_example23( self ) :
+
+    test_id = "test_example23"
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "b", [ [ 0, 1 ], [ 1, 2 ], [ 5, 6 ] ] )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original query
+    query = "a(X,Y) :- b(X,Y,_) ;"
+    yp.setQuery( query )
+    logging.debug( "  " + test_id + " : set query '" + query + "' to db instance." )
+
+    schema = { "a":["int","int"], "b":["int","int","int"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # test 0 : one composite index over the bound columns
+    self.assertEqual( yp.resolveWildcards( "b", ( "0", "1", "_" ) ), [ ( "0", "1", "5" ), ( "0", "1", "6" ) ] )
+    self.assertEqual( yp.resolveWildcards( "b", ( "3", "1", "_" ) ), [] )
+    self.assertTrue( ( "b", ( 0, 1 ) ) in yp.results_indexes )
+    self.assertFalse( ( "b", ( 0, ) ) in yp.results_indexes )
+
+    # test 1 : a single bound column
+    self.assertEqual( yp.resolveWildcards( "b", ( "_", "2", "_" ) ), [ ( "0", "2", "5" ), ( "1", "2", "5" ), ( "0", "2", "6" ), ( "1", "2", "6" ) ] )
+
+    # test 2 : the wildcard subgoal of a(1,2)
+    graphData = yp.get_prov_tree( "a", [ "1", "2" ], [] )
+    expectedNodes = [ '"G_a(1,2)"', '"R_a_prov0(1,2)"', '"G_b(1,2,_)"', '"G_b(1,2,5)"', '"F_b(1,2,5)"', '"G_b(1,2,6)"', '"F_b(1,2,6)"' ]
+    self.assertEqual( [ n.get_name() for n in graphData[0] ], expectedNodes )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ################
+  #  EXAMPLE 22  #
+  ################
+  # tests restricting provenance rules to the relations of interest
+  def test_example22( self ) :
+
+    test_id = "test_example22"
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "b", [ 0, [ "str1", "str2" ] ] )
+    dbInst.set( "c", [ [ 1, 2 ], [ "str2", "str3" ] ] )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original queries
+    query1 = "a(X,Y) :- b(_,X), c(_,Y) ;"
+    yp.setQuery( query1 )
+    logging.debug( "  " + test_id + " : set query '" + query1 + "' to db instance." )
+
+    query2 = "d(X) :- a(X,_) ;"
+    yp.setQuery( query2 )
+    logging.debug( "  " + test_id + " : set query '" + query2 + "' to db instance." )
+
+    query3 = "e(X) :- c(X,_) ;"
+    yp.setQuery( query3 )
+    logging.debug( "  " + test_id + " : set query '" + query3 + "' to db instance." )
+
+    schema = { "a":["string","string"], "b":["int","string"], "c":["int","string"], "d":["string"], "e":["int"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # only d and the relations it depends on need provenance
+    yp.setProvenanceRelations( [ "d" ] )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # test 0 : provenance rules for d and a only
+    expectedQueryList = [ "a(X,Y) :- b(_,X), c(_,Y) ;", \
+                          "d(X) :- a(X,_) ;", \
+                          "e(X) :- c(X,_) ;", \
+                          "a_prov0(X,Y) :- b(_,X),c(_,Y);", \
+                          "d_prov1(X) :- a(X,_);" ]
+    self.assertEqual( yp.getQueryList(), expectedQueryList )
+    self.assertFalse( "e_prov2" in yp.getSchema() )
+
+    # test 1 : e is still evaluated
+    self.assertEqual( sorted( yp.final_results_dict[ "e" ] ), [ ( "1", ), ( "2", ) ] )
+
+    # test 2 : provenance of d reaches down through a
+    graphData = yp.get_prov_tree( "d", [ "str1" ], [] )
+    names     = [ n.get_name() for n in graphData[0] ]
+    self.assertTrue( '"R_d_prov1(str1)"' in names )
+    self.assertTrue( '"R_a_prov0(str1,str2)"' in names )
+    self.assertTrue( '"F_b(0,str1)"' in names )
+
+    # test 3 : e has no provenance
+    with self.assertRaises( ValueError ) as cm :
+      yp.get_prov_tree( "e", [ "1" ], [] )
+    self.assertEqual( str( cm.exception ), "relation 'e' has no provenance rules, declare it with setProvenanceRelations" )
+
+    # test 4 : the batch reports e instead of aborting
+    results = yp.generate_provenance_batch( [ [ "e", [ "1" ] ], [ "d", [ "str1" ] ] ], "unused", render=False )
+    self.assertEqual( results[0][3], "ERROR : relation 'e' has no provenance rules, declare it with setProvenanceRelations" )
+    self.assertEqual( results[1][3], None )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ################
+  #  EXAMPLE 21  #
+  ################
+  # tests goal-directed evaluation with magic sets
+  def test_example21( self ) :
+
+    test_id = "test_example21"
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "edge", { "a":"b", "b":"c", "c":"d", "x":"y" } )
+    dbInst.set( "mark", { "y":"x" } )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original queries
+    query1 = "path(X,Y) :- edge(X,Y) ;"
+    yp.setQuery( query1 )
+    logging.debug( "  " + test_id + " : set query '" + query1 + "' to db instance." )
+
+    query2 = "path(X,Y) :- edge(X,Z), path(Z,Y) ;"
+    yp.setQuery( query2 )
+    logging.debug( "  " + test_id + " : set query '" + query2 + "' to db instance." )
+
+    query3 = "flip(X,Y) :- mark(X,Y) ;"
+    yp.setQuery( query3 )
+    logging.debug( "  " + test_id + " : set query '" + query3 + "' to db instance." )
+
+    schema = { "path":["string","string"], "edge":["string","string"], "mark":["string","string"], "flip":["string","string"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test goal-directed evaluation results
+    logging.debug( "  " + test_id + " : calling 'run_goal_directed' on YProv instance." )
+    allProgramData = yp.run_goal_directed( "path", [ "b", "d" ] )
+
+    # test 0 : the rules are guarded by magic relations seeded with the target
+    expectedQueryList = [ 'magic_path("b","d") ;', \
+                          'magic_path(Z,Y) :- magic_path(X,Y), edge(X,Z) ;', \
+                          'path(X,Y) :- magic_path(X,Y), edge(X,Y) ;', \
+                          'path(X,Y) :- magic_path(X,Y), edge(X,Z), path(Z,Y) ;', \
+                          'path_prov0(X,Y) :- magic_path(X,Y),edge(X,Y);', \
+                          'path_prov1(X,Y,Z) :- magic_path(X,Y),edge(X,Z),path(Z,Y);' ]
+    self.assertEqual( yp.getQueryList(), expectedQueryList )
+    self.assertEqual( yp.getSchema()[ "magic_path" ], [ "string", "string" ] )
+
+    # test 1 : only the tuples relevant to the target are derived
+    self.assertEqual( sorted( yp.final_results_dict[ "path" ] ), [ ( "b", "d" ), ( "c", "d" ) ] )
+    self.assertEqual( yp.final_results_dict[ "flip" ], [] )
+
+    # test 2 : the provenance graph hides the magic guards
+    graphData = yp.get_prov_tree( "path", [ "b", "d" ], [] )
+    expectedNodes = [ '"G_path(b,d)"', '"R_path_prov1(b,d,c)"', '"G_path(c,d)"', '"R_path_prov0(c,d)"', \
+                      '"G_edge(c,d)"', '"F_edge(c,d)"', '"G_edge(b,c)"', '"F_edge(b,c)"' ]
+    self.assertEqual( [ n.get_name() for n in graphData[0] ], expectedNodes )
+    self.assertEqual( yp.annotate_provenance( "counting", [ "path" ] )[ "path" ], { ( "b", "d" ) : 1, ( "c", "d" ) : 1 } )
+
+    # test 3 : wildcards leave their positions unbound
+    yp2 = YProv.YProv( "pickledb", dbInst )
+    yp2.setQuery( query1 )
+    yp2.setQuery( query2 )
+    for rel in schema :
+      yp2.setSchema( rel, schema[rel] )
+    yp2.run_goal_directed( "path", [ "_", "c" ] )
+
+    self.assertEqual( yp2.getQueryList()[0], 'magic_path("c") ;' )
+    self.assertEqual( sorted( yp2.final_results_dict[ "path" ] ), [ ( "a", "c" ), ( "b", "c" ) ] )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ################
+  #  EXAMPLE 20  #
+  ################
+  # tests summarizing wildcard fan-in into aggregate nodes
+  def test_example20( self ) :
+
+    test_id = "test_example20"
+    saveDir = tempfile.mkdtemp()
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "b", [ 0, [ "str1" ] ] )
+    dbInst.set( "c", [ [ 1, 2, 3 ], [ "str2" ] ] )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original query
+    query = "a(X,Y) :- b(_,X), c(_,Y) ;"
+    yp.setQuery( query )
+    logging.debug( "  " + test_id + " : set query '" + query + "' to db instance." )
+
+    schema = { "a":["string","string"], "b":["int","string"],"c":["int","string"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # test 0 : the three goals of c(_,str2) collapse into one aggregate
+    graphData = yp.get_prov_tree( "a", [ "str1", "str2" ], [] )
+    summary   = yp.summarize_provenance( graphData, maxSiblings=2, sampleSize=2 )
+    nodeSet, edgeSet = summary.graph()
+
+    aggregate = [ n for n in nodeSet if n.nodeType == "aggregate" ][0]
+    self.assertEqual( aggregate.get_name(), '"A_G_c(_,str2)/G_c"' )
+    self.assertEqual( aggregate.count, 3 )
+    self.assertEqual( aggregate.get_label(), "3 x G_c : G_c(1,str2), G_c(2,str2), ..." )
+    self.assertEqual( [ n.get_name() for n in summary.getMembers( aggregate ) ], [ '"G_c(1,str2)"', '"G_c(2,str2)"', '"G_c(3,str2)"' ] )
+
+    names = set( [ n.get_name() for n in nodeSet ] )
+    self.assertEqual( names, set( [ '"G_a(str1,str2)"', '"R_a_prov0(str1,str2)"', '"G_b(_,str1)"', '"G_b(0,str1)"', '"F_b(0,str1)"', '"G_c(_,str2)"', '"A_G_c(_,str2)/G_c"' ] ) )
+    self.assertTrue( [ '"G_c(_,str2)"', '"A_G_c(_,str2)/G_c"' ] in [ [ e.get_source(), e.get_destination() ] for e in edgeSet ] )
+
+    # test 1 : expanding the aggregate restores the full graph
+    nodeSet, edgeSet = summary.expand( aggregate )
+    self.assertEqual( set( [ n.get_name() for n in nodeSet ] ), set( [ n.get_name() for n in graphData[0] ] ) )
+    self.assertEqual( len( edgeSet ), len( graphData[1] ) )
+
+    nodeSet, edgeSet = summary.collapse( aggregate.get_name() )
+    self.assertEqual( len( nodeSet ), 7 )
+
+    # test 2 : small sibling groups stay visible
+    nodeSet, edgeSet = yp.summarize_provenance( graphData, maxSiblings=3 ).graph()
+    self.assertEqual( len( nodeSet ), len( graphData[0] ) )
+
+    # test 3 : generate_provenance exports the summarized graph
+    savePath = saveDir + "/" + test_id
+    yp.generate_provenance( "a", [ "str1", "str2" ], savePath, exportFormats=[ "jsonl" ], render=False, maxSiblings=2 )
+
+    records = [ json.loads( line ) for line in open( savePath + ".jsonl" ) ]
+    aggregates = [ r for r in records if r[ "type" ] == "node" and r[ "kind" ] == "aggregate" ]
+    self.assertEqual( len( aggregates ), 1 )
+    self.assertEqual( aggregates[0][ "count" ], 3 )
+    self.assertEqual( aggregates[0][ "sample" ], [ "G_c(1,str2)", "G_c(2,str2)", "G_c(3,str2)" ] )
+
+    # ---------------------------- #
+    dbInst.deldb()
+    shutil.rmtree( saveDir )
+
+
+  ################
+  #  EXAMPLE 19  #
+  ################
+  # tests background rendering of batch provenance
+  @unittest.skipIf( YProv.concurrent is None, "background rendering needs concurrent.futures" )
+  def test_example19( self ) :
+
+    test_id = "test_example19"
+    saveDir = tempfile.mkdtemp()
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "b", [ 0, [ "str1", "str2" ] ] )
+    dbInst.set( "c", [ [ 1, 2 ], [ "str2", "str3" ] ] )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original query
+    query = "a(X,Y) :- b(_,X), c(_,Y) ;"
+    yp.setQuery( query )
+    logging.debug( "  " + test_id + " : set query '" + query + "' to db instance." )
+
+    schema = { "a":["string","string"], "b":["int","string"],"c":["int","string"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # test 0 : batch renders are queued on the pool
+    pool     = yp.setRenderPool( workers=2, maxPending=2 )
+    savePath = saveDir + "/" + test_id
+    targets  = [ [ "a", [ "str1", "str2" ] ], [ "a", [ "str9", "str2" ] ], [ "a", [ "str2", "str3" ] ] ]
+    results  = yp.generate_provenance_batch( targets, savePath )
+
+    self.assertEqual( results[1][3], "ERROR : input data tuple '['str9', 'str2']' not in the evaluation results for relation 'a'" )
+    self.assertEqual( pool.wait(), [ [ savePath + "_0", "done", None ], [ savePath + "_2", "done", None ] ] )
+    self.assertEqual( [ r[4] for r in results ], pool.jobs[ :1 ] + [ None ] + pool.jobs[ 1:2 ] )
+    self.assertEqual( results[0][4].status(), "done" )
+
+    # test 1 : single and combined renders hand back their jobs
+    graphData = yp.generate_provenance( "a", [ "str1", "str2" ], savePath + "_single" )
+    self.assertTrue( graphData[2] is pool.jobs[2] )
+    results   = yp.generate_provenance_batch( targets, savePath + "_combined", combined=True )
+    self.assertTrue( results[0][4] is pool.jobs[3] )
+    self.assertTrue( results[2][4] is pool.jobs[3] )
+    self.assertEqual( results[1][4], None )
+    self.assertEqual( [ s[1] for s in pool.wait() ], [ "done" ] * 4 )
+
+    # test 2 : render errors are reported per job
+    job = pool.submit( [ ProvGraph.ProvNode( "unknown", "a", ( "str1", ) ) ], [], savePath + "_bad" )
+    self.assertEqual( pool.wait()[-1][1], "failed" )
+    self.assertEqual( job.status(), "failed" )
+    self.assertFalse( job.error() is None )
+
+    pool.shutdown()
+
+    # ---------------------------- #
+    dbInst.deldb()
+    shutil.rmtree( saveDir )
+
+
+  ################
+  #  EXAMPLE 18  #
+  ################
+  # tests exporting a provenance graph without rendering it
+  def test_example18( self ) :
+
+    test_id = "test_example18"
+    saveDir = tempfile.mkdtemp()
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "b", [ 0, [ "str1", "str2" ] ] )
+    dbInst.set( "c", [ [ 1, 2 ], [ "str2", "str3" ] ] )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original query
+    query = "a(X,Y) :- b(_,X), c(_,Y) ;"
+    yp.setQuery( query )
+    logging.debug( "  " + test_id + " : set query '" + query + "' to db instance." )
+
+    schema = { "a":["string","string"], "b":["int","string"],"c":["int","string"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # test exported files
+    savePath  = saveDir + "/" + test_id
+    graphData = yp.generate_provenance( "a", [ "str1", "str2" ], savePath, exportFormats=[ "dot", "jsonl", "graphml" ], render=False )
+
+    self.assertEqual( sorted( os.listdir( saveDir ) ), [ test_id + ".dot", test_id + ".graphml", test_id + ".jsonl" ] )
+
+    records = [ json.loads( line ) for line in open( savePath + ".jsonl" ) ]
+    nodes   = [ r for r in records if r[ "type" ] == "node" ]
+    edges   = [ r for r in records if r[ "type" ] == "edge" ]
+
+    self.assertEqual( len( nodes ), len( graphData[0] ) )
+    self.assertEqual( len( edges ), len( graphData[1] ) )
+    self.assertEqual( nodes[0], { "type":"node", "id":"G_a(str1,str2)", "kind":"goal", "relation":"a", "tuple":[ "str1", "str2" ] } )
+    self.assertEqual( edges[0], { "type":"edge", "source":"G_a(str1,str2)", "target":"R_a_prov0(str1,str2)" } )
+
+    dot = open( savePath + ".dot" ).read()
+    self.assertTrue( '"G_a(str1,str2)" -> "R_a_prov0(str1,str2)";' in dot )
+
+    # exporters also write to file-like objects
+    out = StringIO()
+    ProvExport.export( "graphml", graphData[0], graphData[1], out )
+    self.assertEqual( out.getvalue().count( "<node " ), len( graphData[0] ) )
+    self.assertEqual( out.getvalue().count( "<edge " ), len( graphData[1] ) )
+
+    # ---------------------------- #
+    dbInst.deldb()
+    shutil.rmtree( saveDir )
+
+
+  ################
+  #  EXAMPLE 17  #
+  ################
+  # tests reusing cached evaluation results for one query with wildcards
+  def test_example17( self ) :
+
+    test_id  = "test_example17"
+    cacheDir = tempfile.mkdtemp()
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "b", [ 0, [ "str1", "str2" ] ] )
+    dbInst.set( "c", [ [ 1, 2 ], [ "str2", "str3" ] ] )
+
+    # --------------------------------------------------------------- #
+    query  = "a(X,Y) :- b(_,X), c(_,Y) ;"
+    schema = { "a":["string","string"], "b":["int","string"],"c":["int","string"] }
+
+    yps = []
+    for i in range( 0, 2 ) :
+      yp = YProv.YProv( "pickledb", dbInst )
+      logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+      yp.setCache( cacheDir )
+      yp.setQuery( query )
+      for rel in schema :
+        yp.setSchema( rel, schema[rel] )
+      yps.append( yp )
+
+    # --------------------------------------------------------------- #
+    # test 0 : the first run evaluates the program and caches the results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yps[0].run()
+    self.assertEqual( len( os.listdir( cacheDir ) ), 1 )
+
+    # test 1 : the second run reuses them without evaluating the program
+    def fail() :
+      self.fail( "program evaluated despite cached results" )
+    yps[1].q.run = fail
+
+    self.assertEqual( yps[1].run(), allProgramData )
+    self.assertEqual( yps[1].final_results_dict, yps[0].final_results_dict )
+    self.assertEqual( len( yps[1].get_prov_tree( "a", [ "str1", "str2" ], [] )[0] ), 10 )
+
+    # the cached strings are interned again
+    for tup in yps[1].final_results_dict[ "a" ] :
+      for v in tup :
+        self.assertTrue( v is intern( v ) )
+
+    # test 2 : cached indexes are interned as well
+    yps[1].getIndex( "a", ( 0, ) )
+    yps[1].saveCache()
+    yp = YProv.YProv( "pickledb", dbInst )
+    yp.setCache( cacheDir )
+    yp.setQuery( query )
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+    yp.run()
+
+    self.assertEqual( yp.results_indexes, yps[1].results_indexes )
+    for key in yp.results_indexes[ ( "a", ( 0, ) ) ] :
+      self.assertTrue( key[0] is intern( key[0] ) )
+
+    # test 3 : changed data misses the cache and evicts the older entry
+    dbInst.set( "c", [ [ 1, 2 ], [ "str3" ] ] )
+
+    yp = YProv.YProv( "pickledb", dbInst )
+    yp.setCache( cacheDir, 1 )
+    yp.setQuery( query )
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+    yp.run()
+
+    self.assertEqual( os.listdir( cacheDir ), [ yp.cache_key + ".cache" ] )
+    self.assertEqual( sorted( yp.final_results_dict[ "a" ] ), [ ( "str1", "str3" ), ( "str2", "str3" ) ] )
+
+    # ---------------------------- #
+    dbInst.deldb()
+    shutil.rmtree( cacheDir )
+
+
+  ################
+  #  EXAMPLE 16  #
+  ################
+  # tests incremental maintenance of a recursive query
+  def test_example16( self ) :
+
+    test_id = "test_example16"
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "edge", { "a":"b" } )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original queries
+    query1 = "path(X,Y) :- edge(X,Y) ;"
+    yp.setQuery( query1 )
+    logging.debug( "  " + test_id + " : set query '" + query1 + "' to db instance." )
+
+    query2 = "path(X,Y) :- edge(X,Z), path(Z,Y) ;"
+    yp.setQuery( query2 )
+    logging.debug( "  " + test_id + " : set query '" + query2 + "' to db instance." )
+
+    schema = { "path":["string","string"], "edge":["string","string"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # test 0 : inserting edge(b,c) derives path(b,c) and path(a,c)
+    logging.debug( "  " + test_id + " : calling 'update_provenance' on YProv instance." )
+    changes = yp.update_provenance( inserts={ "edge":[ [ "b", "c" ] ] } )
+
+    self.assertEqual( sorted( changes[ "path" ][0] ), [ ( "a", "c" ), ( "b", "c" ) ] )
+    self.assertEqual( sorted( yp.final_results_dict[ "path" ] ), [ ( "a", "b" ), ( "a", "c" ), ( "b", "c" ) ] )
+
+    graphData = yp.get_prov_tree( "path", [ "a", "c" ], [] )
+
+    actual_nodeset = []
+    for node in graphData[0] :
+      actual_nodeset.append( node.get_name() )
+
+    expected_nodeset = ['"G_path(a,c)"', \
+                        '"R_path_prov1(a,c,b)"', \
+                        '"G_edge(a,b)"', \
+                        '"F_edge(a,b)"', \
+                        '"G_path(b,c)"', \
+                        '"R_path_prov0(b,c)"', \
+                        '"G_edge(b,c)"', \
+                        '"F_edge(b,c)"']
+
+    self.assertEqual( sorted( actual_nodeset ), sorted( expected_nodeset ) )
+
+    # test 1 : deleting edge(a,b) removes every path from a
+    changes = yp.update_provenance( deletes={ "edge":[ [ "a", "b" ] ] } )
+
+    self.assertEqual( sorted( changes[ "path" ][1] ), [ ( "a", "b" ), ( "a", "c" ) ] )
+    self.assertEqual( yp.final_results_dict[ "path" ], [ ( "b", "c" ) ] )
+    self.assertEqual( yp.final_results_dict[ "path_prov1" ], [] )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ################
+  #  EXAMPLE 15  #
+  ################
+  # tests cheapest derivation search for a recursive query
+  def test_example15( self ) :
+
+    test_id = "test_example15"
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "edge", { "a":"b", "b":"c", "c":"a", "d":"a" } )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original queries
+    query1 = "path(X,Y) :- edge(X,Y) ;"
+    yp.setQuery( query1 )
+    logging.debug( "  " + test_id + " : set query '" + query1 + "' to db instance." )
+
+    query2 = "path(X,Y) :- path(X,Z), path(Z,Y) ;"
+    yp.setQuery( query2 )
+    logging.debug( "  " + test_id + " : set query '" + query2 + "' to db instance." )
+
+    schema = { "path":["string","string"], "edge":["string","string"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # test cheapest derivations
+    ab = ( "edge", ( "a", "b" ) )
+    bc = ( "edge", ( "b", "c" ) )
+    ca = ( "edge", ( "c", "a" ) )
+    da = ( "edge", ( "d", "a" ) )
+
+    # path(a,a) only derives through the whole cycle
+    logging.debug( "  " + test_id + " : calling 'find_minimal_witness' on YProv instance." )
+    self.assertEqual( yp.find_minimal_witness( "path", [ "a", "a" ] ), frozenset( [ ab, bc, ca ] ) )
+
+    # path(d,b) : d->a->b, or d->a->b->c->a->b without repeating a goal
+    logging.debug( "  " + test_id + " : calling 'find_cheapest_derivations' on YProv instance." )
+    derivations = yp.find_cheapest_derivations( "path", [ "d", "b" ], 5, { "edge":2 } )
+    self.assertEqual( derivations, [ [ 4, frozenset( [ da, ab ] ) ], [ 8, frozenset( [ da, ab, bc, ca ] ) ] ] )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ################
+  #  EXAMPLE 14  #
+  ################
+  # tests semiring annotations for one query with wildcards
+  def test_example14( self ) :
+
+    test_id = "test_example14"
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "b", [ 0, [ "str1", "str2" ] ] )
+    dbInst.set( "c", [ [ 1, 2 ], [ "str2", "str3" ] ] )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original query
+    query = "a(X,Y) :- b(_,X), c(_,Y) ;"
+    yp.setQuery( query )
+    logging.debug( "  " + test_id + " : set query '" + query + "' to db instance." )
+
+    schema = { "a":["string","string"], "b":["int","string"],"c":["int","string"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # test semiring annotations
+    b0 = ( "b", ( "0", "str1" ) )
+    c1 = ( "c", ( "1", "str2" ) )
+    c2 = ( "c", ( "2", "str2" ) )
+    a  = ( "str1", "str2" )
+
+    logging.debug( "  " + test_id + " : calling 'annotate_provenance' on YProv instance." )
+    self.assertEqual( yp.annotate_provenance( "lineage" )[ "a" ][ a ], frozenset( [ b0, c1, c2 ] ) )
+    self.assertEqual( yp.annotate_provenance( "why" )[ "a" ][ a ], \
+                      frozenset( [ frozenset( [ b0, c1 ] ), frozenset( [ b0, c2 ] ) ] ) )
+    self.assertEqual( yp.annotate_provenance( "polynomial" )[ "a" ][ a ], \
+                      { ( ( b0, 1 ), ( c1, 1 ) ) : 1, ( ( b0, 1 ), ( c2, 1 ) ) : 1 } )
+    self.assertEqual( yp.annotate_provenance( "counting" )[ "a" ], \
+                      { ( "str1", "str2" ):2, ( "str1", "str3" ):2, ( "str2", "str2" ):2, ( "str2", "str3" ):2 } )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ################
+  #  EXAMPLE 13  #
+  ################
+  # tests provenance statistics for one query with wildcards
+  def test_example13( self ) :
+
+    test_id = "test_example13"
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "b", [ 0, [ "str1", "str2" ] ] )
+    dbInst.set( "c", [ [ 1, 2 ], [ "str2", "str3" ] ] )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original query
+    query = "a(X,Y) :- b(_,X), c(_,Y) ;"
+    yp.setQuery( query )
+    logging.debug( "  " + test_id + " : set query '" + query + "' to db instance." )
+
+    schema = { "a":["string","string"], "b":["int","string"],"c":["int","string"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # test provenance statistics
+    logging.debug( "  " + test_id + " : calling 'generate_provenance_stats' on YProv instance." )
+    stats = yp.generate_provenance_stats( "a", [ "str1", "str2" ] )
+
+    # b(_,str1) matches b(0,str1), c(_,str2) matches c(1,str2) and c(2,str2).
+    # longest path : G_a -> R_a_prov0 -> G_c(_,str2) -> G_c(1,str2) -> F_c(1,str2)
+    self.assertEqual( stats[ "derivations" ], 2 )
+    self.assertEqual( stats[ "maxDepth" ], 4 )
+    self.assertEqual( stats[ "facts" ], { "b":1, "c":2 } )
+    self.assertEqual( stats[ "firings" ], { "a_prov0":1 } )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ################
+  #  EXAMPLE 12  #
+  ################
+  # tests parallel provenance against the sequential traversal
+  @unittest.skipIf( YProv.concurrent is None, "parallel provenance needs concurrent.futures" )
+  def test_example12( self ) :
+
+    test_id = "test_example12"
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "b", [ 0, [ "str1", "str2" ] ] )
+    dbInst.set( "c", [ [ 1, 2 ], [ "str2", "str3" ] ] )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original query
+    query = "a(X,Y) :- b(_,X), c(_,Y) ;"
+    yp.setQuery( query )
+    logging.debug( "  " + test_id + " : set query '" + query + "' to db instance." )
+
+    schema = { "a":["string","string"], "b":["int","string"],"c":["int","string"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # parallel and sequential graphs hold the same nodes and edges
+    for tup in [ [ "str1", "str2" ], [ "str2", "str3" ] ] :
+      logging.debug( "  " + test_id + " : calling 'get_prov_tree_parallel' on " + str( tup ) )
+      parallelData   = yp.get_prov_tree_parallel( "a", tup, [], 2 )
+      sequentialData = yp.get_prov_tree( "a", tup, [] )
+
+      self.assertEqual( sorted( [ node.get_name() for node in parallelData[0] ] ), \
+                        sorted( [ node.get_name() for node in sequentialData[0] ] ) )
+      self.assertEqual( sorted( [ [ edge.get_source(), edge.get_destination() ] for edge in parallelData[1] ] ), \
+                        sorted( [ [ edge.get_source(), edge.get_destination() ] for edge in sequentialData[1] ] ) )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ################
+  #  EXAMPLE 11  #
+  ################
+  # tests whole-relation provenance materialization for one query with wildcards
+  def test_example11( self ) :
+
+    test_id = "test_example11"
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "b", [ 0, [ "str1", "str2" ] ] )
+    dbInst.set( "c", [ [ 1, 2 ], [ "str2", "str3" ] ] )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original query
+    query = "a(X,Y) :- b(_,X), c(_,Y) ;"
+    yp.setQuery( query )
+    logging.debug( "  " + test_id + " : set query '" + query + "' to db instance." )
+
+    schema = { "a":["string","string"], "b":["int","string"],"c":["int","string"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # test materialized provenance graph results
+    logging.debug( "  " + test_id + " : calling 'materialize_provenance' on YProv instance." )
+    graphData = yp.materialize_provenance( [ "a" ] )
+
+    # a : 4 goals, 4 rule nodes and 4 wildcard goals.
+    # c : 4 goals with facts. b : 2 goals with facts.
+    self.assertEqual( len( graphData[0] ), 4 + 4 + 4 + 4 * 2 + 2 * 2 )
+
+    # slice one tuple out of the materialized graph
+    graphData = yp.get_materialized_prov_tree( "a", [ "str1", "str2" ] )
+
+    actual_nodeset = []
+    for node in graphData[0] :
+      actual_nodeset.append( node.get_name() )
+
+    actual_edgeset = []
+    for edge in graphData[1] :
+      actual_edgeset.append( [ edge.get_source(), edge.get_destination() ] )
+
+    expected_nodeset = ['"G_a(str1,str2)"', \
+                        '"R_a_prov0(str1,str2)"', \
+                        '"G_c(_,str2)"', \
+                        '"G_c(2,str2)"', \
+                        '"F_c(2,str2)"', \
+                        '"G_c(1,str2)"', \
+                        '"F_c(1,str2)"', \
+                        '"G_b(_,str1)"', \
+                        '"G_b(0,str1)"', \
+                        '"F_b(0,str1)"']
+    expected_edgeset = [['"G_a(str1,str2)"', '"R_a_prov0(str1,str2)"'], \
+                        ['"R_a_prov0(str1,str2)"', '"G_c(_,str2)"'], \
+                        ['"G_c(_,str2)"', '"G_c(2,str2)"'], \
+                        ['"G_c(2,str2)"', '"F_c(2,str2)"'], \
+                        ['"G_c(_,str2)"', '"G_c(1,str2)"'], \
+                        ['"G_c(1,str2)"', '"F_c(1,str2)"'], \
+                        ['"R_a_prov0(str1,str2)"', '"G_b(_,str1)"'], \
+                        ['"G_b(_,str1)"', '"G_b(0,str1)"'], \
+                        ['"G_b(0,str1)"', '"F_b(0,str1)"']]
+
+    self.assertEqual( sorted( actual_nodeset ), sorted( expected_nodeset ) )
+    self.assertEqual( sorted( actual_edgeset ), sorted( expected_edgeset ) )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ################
+  #  EXAMPLE 10  #
+  ################
+  # tests batch provenance for tuples sharing a wildcard subgoal
+  def test_example10( self ) :
+
+    test_id = "test_example10"
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "b", [ 0, [ "str1", "str2" ] ] )
+    dbInst.set( "c", [ [ 1, 2 ], [ "str2", "str3" ] ] )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original query
+    query = "a(X,Y) :- b(_,X), c(_,Y) ;"
+    yp.setQuery( query )
+    logging.debug( "  " + test_id + " : set query '" + query + "' to db instance." )
+
+    schema = { "a":["string","string"], "b":["int","string"],"c":["int","string"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # test batch provenance graph results
+    logging.debug( "  " + test_id + " : calling 'generate_provenance_batch' on YProv instance." )
+    targets = [ [ "a", [ "str1", "str2" ] ], \
+                [ "a", [ "str2", "str2" ] ], \
+                [ "a", [ "str9", "str2" ] ] ]
+    results = yp.generate_provenance_batch( targets, SAVEPATH + "/" + test_id )
+
+    self.assertEqual( len( results ), 3 )
+
+    # test 0 : first target, same graph as a single call
+    self.assertEqual( results[0][3], None )
+
+    actual_nodeset = []
+    for node in results[0][2][0] :
+      actual_nodeset.append( node.get_name() )
+
+    expected_nodeset = ['"G_a(str1,str2)"', \
+                        '"R_a_prov0(str1,str2)"', \
+                        '"G_c(_,str2)"', \
+                        '"G_c(2,str2)"', \
+                        '"F_c(2,str2)"', \
+                        '"G_c(1,str2)"', \
+                        '"F_c(1,str2)"', \
+                        '"G_b(_,str1)"', \
+                        '"G_b(0,str1)"', \
+                        '"F_b(0,str1)"']
+
+    self.assertEqual( actual_nodeset, expected_nodeset )
+
+    # test 1 : second target, includes the shared c(_,str2) subtree
+    self.assertEqual( results[1][3], None )
+
+    actual_nodeset = []
+    for node in results[1][2][0] :
+      actual_nodeset.append( node.get_name() )
+
+    actual_edgeset = []
+    for edge in results[1][2][1] :
+      actual_edgeset.append( [ edge.get_source(), edge.get_destination() ] )
+
+    expected_nodeset = ['"G_a(str2,str2)"', \
+                        '"R_a_prov0(str2,str2)"', \
+                        '"G_c(_,str2)"', \
+                        '"G_c(2,str2)"', \
+                        '"F_c(2,str2)"', \
+                        '"G_c(1,str2)"', \
+                        '"F_c(1,str2)"', \
+                        '"G_b(_,str2)"', \
+                        '"G_b(0,str2)"', \
+                        '"F_b(0,str2)"']
+    expected_edgeset = [['"G_a(str2,str2)"', '"R_a_prov0(str2,str2)"'], \
+                        ['"R_a_prov0(str2,str2)"', '"G_c(_,str2)"'], \
+                        ['"G_c(_,str2)"', '"G_c(2,str2)"'], \
+                        ['"G_c(2,str2)"', '"F_c(2,str2)"'], \
+                        ['"G_c(_,str2)"', '"G_c(1,str2)"'], \
+                        ['"G_c(1,str2)"', '"F_c(1,str2)"'], \
+                        ['"R_a_prov0(str2,str2)"', '"G_b(_,str2)"'], \
+                        ['"G_b(_,str2)"', '"G_b(0,str2)"'], \
+                        ['"G_b(0,str2)"', '"F_b(0,str2)"']]
+
+    self.assertEqual( sorted( actual_nodeset ), sorted( expected_nodeset ) )
+    self.assertEqual( sorted( actual_edgeset ), sorted( expected_edgeset ) )
+
+    # test 2 : unknown tuple is reported, not fatal
+    self.assertEqual( results[2][2], None )
+    self.assertEqual( results[2][3], "ERROR : input data tuple '['str9', 'str2']' not in the evaluation results for relation 'a'" )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ###############
+  #  EXAMPLE 9  #
+  ###############
+  # tests lazy exploration of two queries with wildcards
+  def test_example9( self ) :
+
+    test_id = "test_example9"
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "b", [ 0, [ "str1", "str2" ] ] )
+    dbInst.set( "c", [ [ 1, 2 ], [ "str2", "str3" ] ] )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original queries
+    query1 = "a(X) :- b(_,X) ;"
+    yp.setQuery( query1 )
+    logging.debug( "  " + test_id + " : set query '" + query1 + "' to db instance." )
+
+    query2 = "a(X) :- c(_,X) ;"
+    yp.setQuery( query2 )
+    logging.debug( "  " + test_id + " : set query '" + query2 + "' to db instance." )
+
+    schema = { "a":["string"], "b":["int","string"],"c":["int","string"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # test lazy provenance exploration
+
+    # test 0 : first two levels, one derivation per goal
+    logging.debug( "  " + test_id + " : calling 'explore_provenance' on YProv instance." )
+    explorer = yp.explore_provenance( "a", [ "str2" ], maxDepth=2, maxDerivations=1 )
+
+    actual_events = []
+    for event in explorer :
+      if event[0] == "edge" :
+        actual_events.append( [ "edge", event[1].get_source(), event[1].get_destination() ] )
+      else :
+        actual_events.append( [ event[0], event[1].get_name() ] )
+
+    expected_events = [['node', '"G_a(str2)"'], \
+                       ['frontier', '"G_a(str2)"'], \
+                       ['node', '"R_a_prov0(str2)"'], \
+                       ['edge', '"G_a(str2)"', '"R_a_prov0(str2)"'], \
+                       ['node', '"G_b(_,str2)"'], \
+                       ['edge', '"R_a_prov0(str2)"', '"G_b(_,str2)"'], \
+                       ['frontier', '"G_b(_,str2)"']]
+
+    self.assertEqual( actual_events, expected_events )
+
+    # test 1 : expand a frontier node
+    actual_events = []
+    for event in explorer.expand( '"G_b(_,str2)"' ) :
+      if event[0] == "edge" :
+        actual_events.append( [ "edge", event[1].get_source(), event[1].get_destination() ] )
+      else :
+        actual_events.append( [ event[0], event[1].get_name() ] )
+
+    expected_events = [['node', '"G_b(0,str2)"'], \
+                       ['node', '"F_b(0,str2)"'], \
+                       ['edge', '"G_b(_,str2)"', '"G_b(0,str2)"'], \
+                       ['edge', '"G_b(0,str2)"', '"F_b(0,str2)"']]
+
+    self.assertEqual( actual_events, expected_events )
+    self.assertFalse( explorer.isFrontier( '"G_b(_,str2)"' ) )
+    self.assertTrue( explorer.isFrontier( '"G_a(str2)"' ) )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ###############
+  #  EXAMPLE 8  #
+  ###############
+  # tests recursive queries over cyclic data
+  def test_example8( self ) :
+
+    test_id = "test_example8"
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "edge", { "a":"b", "b":"a" } )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original queries
+    query1 = "path(X,Y) :- edge(X,Y) ;"
+    yp.setQuery( query1 )
+    logging.debug( "  " + test_id + " : set query '" + query1 + "' to db instance." )
+
+    query2 = "path(X,Y) :- edge(X,Z), path(Z,Y) ;"
+    yp.setQuery( query2 )
+    logging.debug( "  " + test_id + " : set query '" + query2 + "' to db instance." )
+
+    schema = { "path":["string","string"], "edge":["string","string"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # test provenance graph results
+    # path(b,b) is derived through path(a,b), which is already on the path.
+
+    # test 0 : back-edges are cut
+    logging.debug( "  " + test_id + " : calling 'generate_provenance' on YProv instance." )
+    graphData      = yp.generate_provenance( "path", [ "a", "b" ], SAVEPATH + "/" + test_id + "_0" )
+
+    nodeSet = graphData[0]
+    edgeSet = graphData[1]
+
+    actual_nodeset = []
+    for node in nodeSet :
+      actual_nodeset.append( node.get_name() )
+
+    actual_edgeset = []
+    for edge in edgeSet :
+      src = edge.get_source()
+      des = edge.get_destination()
+      actual_edgeset.append( [src,des] )
+
+    expected_nodeset = ['"G_path(a,b)"', \
+                        '"R_path_prov0(a,b)"', \
+                        '"G_edge(a,b)"', \
+                        '"F_edge(a,b)"', \
+                        '"R_path_prov1(a,b,b)"', \
+                        '"G_path(b,b)"', \
+                        '"R_path_prov1(b,b,a)"', \
+                        '"G_edge(b,a)"', \
+                        '"F_edge(b,a)"']
+    expected_edgeset = [['"G_path(a,b)"', '"R_path_prov0(a,b)"'], \
+                        ['"R_path_prov0(a,b)"', '"G_edge(a,b)"'], \
+                        ['"G_edge(a,b)"', '"F_edge(a,b)"'], \
+                        ['"G_path(a,b)"', '"R_path_prov1(a,b,b)"'], \
+                        ['"R_path_prov1(a,b,b)"', '"G_edge(a,b)"'], \
+                        ['"R_path_prov1(a,b,b)"', '"G_path(b,b)"'], \
+                        ['"G_path(b,b)"', '"R_path_prov1(b,b,a)"'], \
+                        ['"R_path_prov1(b,b,a)"', '"G_edge(b,a)"'], \
+                        ['"G_edge(b,a)"', '"F_edge(b,a)"']]
+
+    self.assertEqual( sorted( actual_nodeset ), sorted( expected_nodeset ) )
+    self.assertEqual( sorted( actual_edgeset ), sorted( expected_edgeset ) )
+
+    # test 1 : back-edges are linked to the existing goal node
+    logging.debug( "  " + test_id + " : calling 'generate_provenance' on YProv instance." )
+    graphData      = yp.generate_provenance( "path", [ "a", "b" ], SAVEPATH + "/" + test_id + "_1", cycleMode="link" )
+
+    actual_edgeset = []
+    for edge in graphData[1] :
+      src = edge.get_source()
+      des = edge.get_destination()
+      actual_edgeset.append( [src,des] )
+
+    expected_edgeset.append( ['"R_path_prov1(b,b,a)"', '"G_path(a,b)"'] )
+
+    self.assertEqual( sorted( actual_edgeset ), sorted( expected_edgeset ) )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ###############
+  #  EXAMPLE 7  #
+  ###############
+  # tests one query whose firings share a grounded subgoal
+  def test_example7( self ) :
+
+    test_id = "test_example7"
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "b", [ 0, [ 1, 3 ] ] )
+    dbInst.set( "c", [ 5 ] )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original query
+    query = "a(X) :- b(X,Y), c(Z) ;"
+    yp.setQuery( query )
+    logging.debug( "  " + test_id + " : set query '" + query + "' to db instance." )
+
+    schema = { "a":["int"], "b":["int","int"], "c":["int"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    # --------------------------------------------------------------- #
+    # test provenance graph results
+    # both firings reach c(5), which must be expanded only once.
+    logging.debug( "  " + test_id + " : calling 'generate_provenance' on YProv instance." )
+    graphData      = yp.generate_provenance( "a", [ 0 ], SAVEPATH + "/" + test_id )
+
+    nodeSet = graphData[0]
+    edgeSet = graphData[1]
+
+    actual_nodeset = []
+    for node in nodeSet :
+      actual_nodeset.append( node.get_name() )
+
+    actual_edgeset = []
+    for edge in edgeSet :
+      src = edge.get_source()
+      des = edge.get_destination()
+      actual_edgeset.append( [src,des] )
+
+    expected_nodeset = ['"G_a(0)"', \
+                        '"R_a_prov0(0,1,5)"', \
+                        '"R_a_prov0(0,3,5)"', \
+                        '"G_b(0,1)"', \
+                        '"F_b(0,1)"', \
+                        '"G_b(0,3)"', \
+                        '"F_b(0,3)"', \
+                        '"G_c(5)"', \
+                        '"F_c(5)"']
+    expected_edgeset = [['"G_a(0)"', '"R_a_prov0(0,1,5)"'], \
+                        ['"G_a(0)"', '"R_a_prov0(0,3,5)"'], \
+                        ['"R_a_prov0(0,1,5)"', '"G_b(0,1)"'], \
+                        ['"R_a_prov0(0,1,5)"', '"G_c(5)"'], \
+                        ['"G_b(0,1)"', '"F_b(0,1)"'], \
+                        ['"R_a_prov0(0,3,5)"', '"G_b(0,3)"'], \
+                        ['"R_a_prov0(0,3,5)"', '"G_c(5)"'], \
+                        ['"G_b(0,3)"', '"F_b(0,3)"'], \
+                        ['"G_c(5)"', '"F_c(5)"']]
+
+    self.assertEqual( sorted( actual_nodeset ), sorted( expected_nodeset ) )
+    self.assertEqual( sorted( actual_edgeset ), sorted( expected_edgeset ) )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
+  ###############
+  #  EXAMPLE 6  #
+  ###############
+  # tests two queries whose goal names share a prefix
+  def test_example6( self ) :
+
+    test_id = "test_example6"
+
+    # --------------------------------------------------------------- #
+    logging.info( "  " + test_id + ": initializing pickledb instance." )
+    dbInst = pickledb.load( "./test_yprov.db", False )
+
+    # --------------------------------------------------------------- #
+    dbInst.set( "b", [ 0, [ 1 ] ] )
+    dbInst.set( "c", [ 0, [ 1 ] ] )
+
+    # --------------------------------------------------------------- #
+    yp = YProv.YProv( "pickledb", dbInst )
+    logging.debug( "  " + test_id + " : instantiated YProv instance '" + str( yp ) )
+
+    # set original queries
+    query1 = "a(X,Y) :- b(X,Y) ;"
+    yp.setQuery( query1 )
+    logging.debug( "  " + test_id + " : set query '" + query1 + "' to db instance." )
+
+    query2 = "ab(X,Y) :- c(X,Y) ;"
+    yp.setQuery( query2 )
+    logging.debug( "  " + test_id + " : set query '" + query2 + "' to db instance." )
+
+    schema = { "a":["int","int"], "ab":["int","int"], "b":["int","int"], "c":["int","int"] }
+
+    for rel in schema :
+      yp.setSchema( rel, schema[rel] )
+      logging.debug( "  " + test_id + " : set relation '" + rel + "' to schema " + str( schema[rel] ) )
+
+    # --------------------------------------------------------------- #
+    # test evaluation results
+    logging.debug( "  " + test_id + " : calling 'run' on YProv instance." )
+    allProgramData = yp.run()
+
+    actual_table_list = allProgramData[1]
+
+    expected_table_list = [ "a", "ab", "b", "c", "a_prov0", "ab_prov1" ]
+
+    self.assertEqual( sorted( actual_table_list ), sorted( expected_table_list ) )
+
+    # --------------------------------------------------------------- #
+    # test provenance graph results
+    # ab_prov1 must not be picked up as a provenance rule for a.
+    logging.debug( "  " + test_id + " : calling 'generate_provenance' on YProv instance." )
+    graphData      = yp.generate_provenance( "a", [ 0,1 ], SAVEPATH + "/" + test_id )
+
+    nodeSet = graphData[0]
+    edgeSet = graphData[1]
+
+    actual_nodeset = []
+    for node in nodeSet :
+      actual_nodeset.append( node.get_name() )
+
+    actual_edgeset = []
+    for edge in edgeSet :
+      src = edge.get_source()
+      des = edge.get_destination()
+      actual_edgeset.append( [src,des] )
+
+    expected_nodeset = ['"G_a(0,1)"', \
+                        '"R_a_prov0(0,1)"', \
+                        '"G_b(0,1)"', \
+                        '"F_b(0,1)"']
+    expected_edgeset = [['"G_a(0,1)"', '"R_a_prov0(0,1)"'], \
+                        ['"R_a_prov0(0,1)"', '"G_b(0,1)"'], \
+                        ['"G_b(0,1)"', '"F_b(0,1)"']]
+
+    self.assertEqual( actual_nodeset, expected_nodeset )
+    self.assertEqual( actual_edgeset, expected_edgeset )
+
+    # ---------------------------- #
+    dbInst.deldb()
+
+
   ###############
   #  EXAMPLE 5  #
   ###############
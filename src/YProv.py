@@ -8,9 +8,25 @@
 ##########################################################################
 
 # -------------------------------------- #
-import logging, os, pydot, string, sys
+import hashlib, heapq, json, logging, multiprocessing, os, string, sys
+
+# concurrent.futures is only needed for parallel provenance.
+# python 2 installs it with the futures backport.
+try :
+  import concurrent.futures
+except ImportError :
+  concurrent = None
 
 # import sibling packages HERE!!!
+import ProvExplorer
+import ProvExport
+import ProvGraph
+import ProvSummary
+import ProvWorker
+import RenderPool
+import ResultsCache
+import Rule
+import Semiring
 
 # adapters path
 adaptersPath  = os.path.abspath( __file__ + "/../../../../adapters" )
@@ -38,6 +54,47 @@ import settings
 
 DEBUG = settings.DEBUG
 
+# characters stripped from data values when building tuple keys
+KEY_DELETE_CHARS = string.whitespace + "[]'\""
+
+# number of pending subtrees per worker process before
+# get_prov_tree_parallel hands the traversal to the pool.
+PARALLEL_SEED_FACTOR = 4
+
+# ways of handling edges back to goals already on the derivation path.
+# "cut" drops the back-edge so the graph stays acyclic.
+# "link" keeps the back-edge to the existing goal node.
+CYCLE_MODES = [ "cut", "link" ]
+
+
+##################
+#  MEMO JOURNAL  #
+##################
+# traversal memo which remembers the keys added since the last commit,
+# so the entries of a failed expansion can be dropped without copying
+# the whole memo.
+class MemoJournal( dict ) :
+
+  def __init__( self ) :
+    dict.__init__( self )
+    self.added = []
+
+  def __setitem__( self, key, value ) :
+    if not key in self :
+      self.added.append( key )
+    dict.__setitem__( self, key, value )
+
+  # keep the entries added since the last commit
+  def commit( self ) :
+    self.added = []
+
+  # drop the entries added since the last commit
+  def rollback( self ) :
+    for key in self.added :
+      del self[ key ]
+    self.added = []
+
+
 class YProv( object ) :
 
   ################
@@ -50,10 +107,31 @@ class YProv( object ) :
   final_program       = None  # final c4 program
   final_table_list    = None  # table list from c4 program
   final_results_array = None  # evaluation results in array form
-  final_results_dict  = None  # evaluation results in dict form
+  final_results_dict  = None  # evaluation results in dict form, relation names mapped to lists of tuple keys
+  final_results_sets  = None  # evaluation results as sets of tuple keys, for membership tests
+  results_indexes     = None  # maps ( relation, column positions ) to hash indexes over final_results_dict
 
   prov_rule_counter   = 0     # counts number of provenance rules in program
 
+  rule_cache          = None  # maps c4 query strings to compiled Rule instances
+
+  idb_rules           = None  # maps goal names to the list of rules defining the relation
+  prov_rules          = None  # maps original rules to their provenance rules
+  prov_rule_origins   = None  # maps provenance rules to their original rules
+  prov_rules_by_rel   = None  # maps original goal names to the list of their provenance rules
+
+  materialized_graph  = None  # [ nodeSet, edgeSet, goal nodes, graph index ] from materialize_provenance
+
+  results_cache       = None  # ResultsCache instance for evaluation results, None if disabled
+  cache_key           = None  # key of the current evaluation results in results_cache
+
+  render_pool         = None  # RenderPool rendering png files in the background, None if synchronous
+
+  prov_relations      = None  # relations declared with setProvenanceRelations, None for every idb relation
+
+  magic_relations     = None  # names of the magic relations added by run_goal_directed, None if evaluating in full
+  magic_rules         = None  # magic rules and seed fact added by run_goal_directed
+
   ##########
   #  INIT  #
   ##########
@@ -61,6 +139,7 @@ class YProv( object ) :
 
     self.nosql_type = nosql_type
     self.dbcursor   = dbcursor
+    self.rule_cache = {}
 
     self.q = Quest.Quest( self.nosql_type, self.dbcursor )
     logging.debug( "  ...instantiated Quest instance '" + str( self.q ) + "'" )
@@ -72,7 +151,13 @@ class YProv( object ) :
   # rel is a string
   # dataTup is an array
   # generate the postive provenance tree for the given relation and data tuple
-  def generate_provenance( self, rel, dataTup, savePath ) :
+  # cycleMode is one of CYCLE_MODES
+  # if workers is set, independent subtrees are expanded on that many processes
+  # if maxSiblings is set, the saved graph is summarized as in summarize_provenance
+  # the graph is saved as described in saveGraph
+  # returns [ nodeSet, edgeSet, renderJob ] of the full graph, where
+  # renderJob is the RenderJob of a background render, None otherwise.
+  def generate_provenance( self, rel, dataTup, savePath, cycleMode="cut", workers=None, exportFormats=None, render=True, maxSiblings=None ) :
 
     # --------------------------------- #
     # verify data tuple is in the evaluation results
@@ -84,7 +169,10 @@ class YProv( object ) :
     # --------------------------------- #
     # generate provenance graph data
 
-    graphData = self.get_prov_tree( rel, dataTup, [] )
+    if workers is None :
+      graphData = self.get_prov_tree( rel, dataTup, [], cycleMode=cycleMode )
+    else :
+      graphData = self.get_prov_tree_parallel( rel, dataTup, [], workers, cycleMode )
     nodeSet   = graphData[0]
     edgeSet   = graphData[1]
 
@@ -96,17 +184,1077 @@ class YProv( object ) :
     #for edge in edgeSet :
     #  print "src = " + str( edge.get_source() ) + ", dest = " + str( edge.get_destination() )
 
+    if not maxSiblings is None :
+      summary = self.summarize_provenance( graphData, maxSiblings )
+      nodeSet, edgeSet = summary.graph()
+
     # --------------------------------- #
-    # create graph
-    graph = pydot.Dot( graph_type = 'digraph', strict=True ) # strict => ignore duplicate edges
+    # output files
+
+    renderJob = self.saveGraph( nodeSet, edgeSet, savePath, exportFormats, render )
+
+    return [ graphData[0], graphData[1], renderJob ]
+
+
+  ###############################
+  #  GENERATE PROVENANCE BATCH  #
+  ###############################
+  # targets is a list of [ rel, dataTup ] pairs.
+  # generate the provenance graphs of all targets over a single memoized
+  # expansion, so goals shared between targets are derived only once.
+  # if combined, one graph holding every target is saved to savePath,
+  # otherwise the graph of target i is saved to savePath + "_" + str( i ).
+  # returns one [ rel, dataTup, graphData, error, renderJob ] entry per
+  # target, where renderJob is the RenderJob of the background render of
+  # the graph holding the target, shared by all targets if combined.
+  # targets which cannot be explained get graphData None and an error
+  # message instead of aborting the batch.
+  # graphs are saved as described in saveGraph.
+  def generate_provenance_batch( self, targets, savePath, combined=False, cycleMode="cut", exportFormats=None, render=True ) :
+
+    if not cycleMode in CYCLE_MODES :
+      sys.exit( "ERROR : unrecognized cycle mode '" + str( cycleMode ) + "'...aborting" )
+
+    results = []
+    memo    = MemoJournal()
+    nodeSet = []
+    edgeSet = []
+
+    # --------------------------------- #
+    # expand all targets into one shared node and edge store
+
+    for target in targets :
+      rel     = target[0]
+      dataTup = target[1]
+
+      if not self.verifyRelTup( rel, dataTup ) :
+        error = "ERROR : input data tuple '" + str( dataTup ) + "' not in the evaluation results for relation '" + str( rel )+ "'"
+        results.append( [ rel, dataTup, None, error, None ] )
+        continue
+
+      # goals memoized by a failed expansion point at nodes which never
+      # reach the store, so they are forgotten again.
+      try :
+        graphData = self.get_prov_tree( rel, dataTup, [], memo, cycleMode )
+      except ( SystemExit, ValueError ) as e :
+        memo.rollback()
+        if isinstance( e, SystemExit ) :
+          error = str( e.code )
+        else :
+          error = "ERROR : " + str( e )
+        results.append( [ rel, dataTup, None, error, None ] )
+        continue
+
+      memo.commit()
+      nodeSet.extend( graphData[0] )
+      edgeSet.extend( graphData[1] )
+      results.append( [ rel, dataTup, None, None, None ] )
+
+    # --------------------------------- #
+    # slice the per target graphs out of the shared store
+
+    graphIndex = self.getGraphIndex( nodeSet, edgeSet )
+    for result in results :
+      if result[3] is None :
+        rootNode  = memo.get( ( result[0], self.getTupKey( result[1] ) ) )
+        result[2] = self.getSubgraph( rootNode, nodeSet, edgeSet, graphIndex )
+
+    # --------------------------------- #
+    # output files
+
+    if combined :
+      renderJob = self.saveGraph( nodeSet, edgeSet, savePath, exportFormats, render )
+      for result in results :
+        if result[3] is None :
+          result[4] = renderJob
+
+    else :
+      for i in range( 0, len( results ) ) :
+        graphData = results[ i ][2]
+        if not graphData is None :
+          results[ i ][4] = self.saveGraph( graphData[0], graphData[1], savePath + "_" + str( i ), exportFormats, render )
+
+    return results
+
+
+  ##################
+  #  GET SUBGRAPH  #
+  ##################
+  # return the [ nodeSet, edgeSet ] of everything reachable from rootNode,
+  # keeping the order of the given node and edge store.
+  # graphIndex is the getGraphIndex of the store. passing it in lets
+  # repeated slices of one store cost the size of the slice, not the store.
+  def getSubgraph( self, rootNode, nodeSet, edgeSet, graphIndex=None ) :
+
+    if rootNode is None :
+      return [ [], [] ]
+
+    if graphIndex is None :
+      graphIndex = self.getGraphIndex( nodeSet, edgeSet )
+    nodePositions = graphIndex[0]
+    outEdges      = graphIndex[1]
+
+    reached   = set( [ rootNode.get_name() ] )
+    worklist  = [ rootNode.get_name() ]
+    edgeSlice = []
+    while len( worklist ) > 0 :
+      name = worklist.pop()
+      for i in outEdges.get( name, [] ) :
+        edgeSlice.append( i )
+        dest = edgeSet[ i ].get_destination()
+        if not dest in reached :
+          reached.add( dest )
+          worklist.append( dest )
+
+    nodeSlice = []
+    for name in reached :
+      nodeSlice.extend( nodePositions.get( name, [] ) )
+
+    subNodeSet = [ nodeSet[ i ] for i in sorted( nodeSlice ) ]
+    subEdgeSet = [ edgeSet[ i ] for i in sorted( edgeSlice ) ]
+
+    return [ subNodeSet, subEdgeSet ]
+
+
+  #####################
+  #  GET GRAPH INDEX  #
+  #####################
+  # return [ node positions, out edges ] for a node and edge store. node
+  # positions maps node names to their positions in nodeSet, out edges maps
+  # the name of every source node to the positions of its edges in edgeSet.
+  def getGraphIndex( self, nodeSet, edgeSet ) :
+
+    nodePositions = {}
+    for i in range( 0, len( nodeSet ) ) :
+      nodePositions.setdefault( nodeSet[ i ].get_name(), [] ).append( i )
+
+    outEdges = {}
+    for i in range( 0, len( edgeSet ) ) :
+      outEdges.setdefault( edgeSet[ i ].get_source(), [] ).append( i )
+
+    return [ nodePositions, outEdges ]
+
+
+  ############################
+  #  MATERIALIZE PROVENANCE  #
+  ############################
+  # build the complete provenance graph of the given relations, or of every
+  # idb relation if rels is None, in one set-oriented pass.
+  # each _prov relation is joined back to its subgoal relations : every
+  # provenance record becomes a rule node linked to its head goal and to
+  # its grounded subgoals, and wildcard subgoals are resolved by probing
+  # the hash indexes of their relations.
+  # the idb relations the given relations depend on are materialized too,
+  # so get_materialized_prov_tree can slice any goal out of the result.
+  # back-edges of recursive relations are kept, as in cycleMode "link".
+  def materialize_provenance( self, rels=None ) :
+
+    if rels is None :
+      rels = self.prov_rules_by_rel.keys()
+
+    nodeSet   = []
+    edgeSet   = []
+    goalNodes = {}
+    graph     = [ nodeSet, edgeSet, goalNodes ]
+
+    for rel in sorted( self.getDependencyClosure( rels ) ) :
+      for provRule in self.prov_rules_by_rel.get( rel, [] ) :
+        rule     = self.getRule( provRule )
+        width    = len( self.getRule( self.prov_rule_origins[ provRule ] ).goalAtts )
+        provGoal = rule.goalName
+
+        # +++++++++++++++++++++++++++++++++++++++++++++++++++++ #
+        # one rule node per provenance record
+
+        for provTup in self.final_results_dict.get( provGoal, [] ) :
+          goalNode = self.addMaterializedGoal( graph, rel, provTup[ :width ] )
+          ruleNode = self.createNode( provGoal, provTup, "rule" )
+          nodeSet.append( ruleNode )
+          edgeSet.append( self.createEdge( goalNode, ruleNode ) )
+
+          for subgoal in rule.subgoalMaps :
+            subTup = []
+            for pos in subgoal[1] :
+              if pos is None :
+                subTup.append( "_" )
+              else :
+                subTup.append( provTup[ pos ] )
+
+            subNode = self.addMaterializedGoal( graph, subgoal[0], tuple( subTup ) )
+            edgeSet.append( self.createEdge( ruleNode, subNode ) )
+
+    self.materialized_graph = [ nodeSet, edgeSet, goalNodes, self.getGraphIndex( nodeSet, edgeSet ) ]
+    logging.debug( "  MATERIALIZE PROVENANCE : " + str( len( nodeSet ) ) + " nodes, " + str( len( edgeSet ) ) + " edges" )
+
+    return [ nodeSet, edgeSet ]
+
+
+  ###########################
+  #  ADD MATERIALIZED GOAL  #
+  ###########################
+  # return the goal node for rel and dataTup in the materialized graph,
+  # creating it on first use. new edb goals get their fact node and new
+  # wildcard goals get edges to the goals of their resolved tuples.
+  # the rule nodes of idb goals are added by materialize_provenance.
+  def addMaterializedGoal( self, graph, rel, dataTup ) :
+
+    nodeSet   = graph[0]
+    edgeSet   = graph[1]
+    goalNodes = graph[2]
+
+    goalKey  = ( rel, dataTup )
+    goalNode = goalNodes.get( goalKey )
+    if not goalNode is None :
+      return goalNode
+
+    goalNode             = self.createNode( rel, dataTup, "goal" )
+    goalNodes[ goalKey ] = goalNode
+    nodeSet.append( goalNode )
+
+    if "_" in dataTup :
+      for tup in self.resolveWildcards( rel, dataTup ) :
+        edgeSet.append( self.createEdge( goalNode, self.addMaterializedGoal( graph, rel, tup ) ) )
+
+    elif self.isEDBOnly( rel ) and not "notin" in rel :
+      factNode = self.createNode( rel, dataTup, "fact" )
+      nodeSet.append( factNode )
+      edgeSet.append( self.createEdge( goalNode, factNode ) )
+
+    return goalNode
+
 
-    # add nodes :
-    for n in nodeSet :
-      graph.add_node( n )
+  ################################
+  #  GET MATERIALIZED PROV TREE  #
+  ################################
+  # slice the provenance graph of one goal out of the materialized graph.
+  # returns [ nodeSet, edgeSet ] like get_prov_tree.
+  def get_materialized_prov_tree( self, rel, dataTup ) :
 
-    # add edges
-    for e in edgeSet :
-      graph.add_edge( e )
+    if self.materialized_graph is None :
+      self.materialize_provenance()
+
+    graph    = self.materialized_graph
+    rootNode = graph[2].get( ( rel, self.getTupKey( dataTup ) ) )
+
+    return self.getSubgraph( rootNode, graph[0], graph[1], graph[3] )
+
+
+  ############################
+  #  GET DEPENDENCY CLOSURE  #
+  ############################
+  # return the set of idb relations among rels plus every idb relation
+  # they depend on through positive subgoals, or through negated subgoals
+  # as well if negated is set.
+  def getDependencyClosure( self, rels, negated=False ) :
+
+    closure  = set()
+    worklist = list( rels )
+    while len( worklist ) > 0 :
+      rel = worklist.pop()
+      if rel in closure or self.isEDBOnly( rel ) :
+        continue
+
+      closure.add( rel )
+      for q in self.idb_rules[ rel ] :
+        if q in self.prov_rule_origins :
+          continue
+        for sub in self.getRule( q ).subgoals :
+          if not sub[2] :
+            worklist.append( sub[0] )
+          elif negated :
+            worklist.append( self.getBaseRelation( sub[0] ) )
+
+    return closure
+
+
+  #########################
+  #  ANNOTATE PROVENANCE  #
+  #########################
+  # annotate the tuples of the given idb relations, and of the idb relations
+  # they depend on, in the given semiring ( a registered name or a
+  # Semiring.Semiring instance ).
+  # the annotations are computed bottom-up over the _prov relations, one
+  # stratum of mutually recursive relations at a time, so every tuple is
+  # annotated in the same pass.
+  # returns a dict mapping relation names to dicts from tuple keys to
+  # annotations. edb relations hold the annotations of the facts used.
+  def annotate_provenance( self, semiring="why", rels=None ) :
+
+    semiring = Semiring.get( semiring )
+
+    if rels is None :
+      rels = self.prov_rules_by_rel.keys()
+
+    annotations = {}
+    for stratum in self.getRelationStrata( self.getDependencyClosure( rels ) ) :
+      self.annotateStratum( stratum, semiring, annotations )
+
+    return annotations
+
+
+  ######################
+  #  ANNOTATE STRATUM  #
+  ######################
+  # annotate the relations of one stratum, given the annotations of every
+  # stratum below it. the goals of the stratum are annotated in the order of
+  # their derivation graph, so goals outside of a cycle are annotated once,
+  # from the finished annotations of their subgoals. see annotateCycle for
+  # the goals on a cycle.
+  def annotateStratum( self, stratum, semiring, annotations ) :
+
+    rels = stratum[0]
+
+    # --------------------------------- #
+    # collect the firings of every goal. a firing is a list of
+    # [ subgoal relation, subgoal tuple, goals of this stratum used ]
+    # triples, one per subgoal.
+
+    firings = {}
+    for rel in rels :
+      annotations[ rel ] = {}
+      for provRule in self.prov_rules_by_rel.get( rel, [] ) :
+        rule  = self.getRule( provRule )
+        width = len( self.getRule( self.prov_rule_origins[ provRule ] ).goalAtts )
+
+        # one firing per provenance record
+        for provTup in self.final_results_dict.get( rule.goalName, [] ) :
+          firing = []
+          for subgoal in rule.subgoalMaps :
+            subTup = []
+            for pos in subgoal[1] :
+              if pos is None :
+                subTup.append( "_" )
+              else :
+                subTup.append( provTup[ pos ] )
+            subTup = tuple( subTup )
+
+            if not subgoal[0] in rels :
+              used = []
+            elif "_" in subTup :
+              used = [ ( subgoal[0], tup ) for tup in self.resolveWildcards( subgoal[0], subTup ) ]
+            else :
+              used = [ ( subgoal[0], subTup ) ]
+            firing.append( [ subgoal[0], subTup, used ] )
+
+          firings.setdefault( ( rel, provTup[ :width ] ), [] ).append( firing )
+
+    # --------------------------------- #
+    # annotate the goals bottom-up
+
+    deps = {}
+    for goal in firings :
+      deps[ goal ] = []
+      for firing in firings[ goal ] :
+        for sub in firing :
+          deps[ goal ].extend( [ dep for dep in sub[2] if dep in firings ] )
+
+    for component in self.getComponents( deps ) :
+      if component[1] :
+        self.annotateCycle( component[0], firings, semiring, annotations )
+      else :
+        goal  = component[0][0]
+        value = semiring.zero()
+        for firing in firings[ goal ] :
+          value = semiring.plus( value, self.getFiringAnnotation( firing, semiring, annotations ) )
+        annotations[ goal[0] ][ goal[1] ] = value
+
+
+  ####################
+  #  ANNOTATE CYCLE  #
+  ####################
+  # annotate a strongly connected component of goals semi-naively : after a
+  # first round over every firing, each round only joins the firings using a
+  # goal whose annotation changed in the previous round, and adds just the
+  # part of their annotations contributed by that change.
+  # semirings which are not idempotent only reach a fixpoint if no tuple has
+  # infinitely many derivations, which is known to fail once more rounds ran
+  # than the component has goals.
+  def annotateCycle( self, goals, firings, semiring, annotations ) :
+
+    members = set( goals )
+    users   = {}  # maps goals to the [ goal, firing position ] pairs using them
+    for goal in goals :
+      for i, firing in enumerate( firings[ goal ] ) :
+        for sub in firing :
+          for dep in sub[2] :
+            if dep in members :
+              users.setdefault( dep, [] ).append( [ goal, i ] )
+
+    maxRounds = 1 + len( goals )
+
+    # --------------------------------- #
+    # first round, from the goals below the component
+
+    previous = {}  # annotations of the changed goals before the last round
+    delta    = {}  # annotation changes of the last round
+    for goal in goals :
+      value = semiring.zero()
+      for firing in firings[ goal ] :
+        value = semiring.plus( value, self.getFiringAnnotation( firing, semiring, annotations ) )
+      previous[ goal ] = semiring.zero()
+      if not value == semiring.zero() :
+        delta[ goal ] = value
+
+    for goal in goals :
+      annotations[ goal[0] ][ goal[1] ] = delta.get( goal, semiring.zero() )
+
+    # --------------------------------- #
+    # join the changes of the last round until nothing changes
+
+    rounds = 1
+    while len( delta ) > 0 :
+      if not semiring.idempotent and rounds > maxRounds :
+        sys.exit( "ERROR : tuples of the recursive relations " + str( sorted( set( [ goal[0] for goal in goals ] ) ) ) + " have infinitely many derivations in semiring '" + semiring.__class__.__name__ + "'...aborting" )
+      rounds += 1
+
+      affected = []
+      seen     = set()
+      for goal in delta :
+        for user in users.get( goal, [] ) :
+          if not tuple( user ) in seen :
+            seen.add( tuple( user ) )
+            affected.append( user )
+
+      changes = {}
+      for user in affected :
+        change             = self.getFiringDelta( firings[ user[0] ][ user[1] ], semiring, annotations, previous, delta )
+        changes[ user[0] ] = semiring.plus( changes.get( user[0], semiring.zero() ), change )
+
+      previous = {}
+      delta    = {}
+      for goal in changes :
+        if changes[ goal ] == semiring.zero() :
+          continue
+        current = annotations[ goal[0] ][ goal[1] ]
+        value   = semiring.plus( current, changes[ goal ] )
+        if semiring.idempotent and value == current :
+          continue
+        previous[ goal ] = current
+        delta[ goal ]    = changes[ goal ]
+
+      for goal in delta :
+        annotations[ goal[0] ][ goal[1] ] = semiring.plus( previous[ goal ], delta[ goal ] )
+
+    logging.debug( "  ANNOTATE CYCLE : " + str( len( goals ) ) + " goals converged after " + str( rounds ) + " rounds" )
+
+
+  ###########################
+  #  GET FIRING ANNOTATION  #
+  ###########################
+  # return the product of the current annotations of the subgoals of firing.
+  def getFiringAnnotation( self, firing, semiring, annotations ) :
+
+    value = semiring.one()
+    for sub in firing :
+      value = semiring.times( value, self.getAnnotation( sub[0], sub[1], semiring, annotations ) )
+
+    return value
+
+
+  ######################
+  #  GET FIRING DELTA  #
+  ######################
+  # return the change of the annotation of firing once the goals in delta
+  # grew from their previous annotations by their delta annotations, i.e.
+  # the sum over the changed subgoals i of the current annotations of the
+  # subgoals before i, times the change of i, times the previous annotations
+  # of the subgoals after i.
+  def getFiringDelta( self, firing, semiring, annotations, previous, delta ) :
+
+    change = semiring.zero()
+    for i in range( 0, len( firing ) ) :
+      subDelta = semiring.zero()
+      for goal in firing[ i ][2] :
+        if goal in delta :
+          subDelta = semiring.plus( subDelta, delta[ goal ] )
+      if subDelta == semiring.zero() :
+        continue
+
+      value = semiring.one()
+      for j in range( 0, len( firing ) ) :
+        sub = firing[ j ]
+        if j < i :
+          value = semiring.times( value, self.getAnnotation( sub[0], sub[1], semiring, annotations ) )
+        elif j == i :
+          value = semiring.times( value, subDelta )
+        elif len( [ goal for goal in sub[2] if goal in previous ] ) == 0 :
+          value = semiring.times( value, self.getAnnotation( sub[0], sub[1], semiring, annotations ) )
+        else :
+          subValue = semiring.zero()
+          for goal in sub[2] :
+            if goal in previous :
+              subValue = semiring.plus( subValue, previous[ goal ] )
+            else :
+              subValue = semiring.plus( subValue, annotations[ goal[0] ].get( goal[1], semiring.zero() ) )
+          value = semiring.times( value, subValue )
+
+      change = semiring.plus( change, value )
+
+    return change
+
+
+  ####################
+  #  GET ANNOTATION  #
+  ####################
+  # return the annotation of the goal rel( dataTup ) given the annotations
+  # computed so far. wildcard goals sum the annotations of their resolved tuples.
+  def getAnnotation( self, rel, dataTup, semiring, annotations ) :
+
+    if "notin" in rel :
+      return semiring.one()
+
+    if "_" in dataTup :
+      value = semiring.zero()
+      for tup in self.resolveWildcards( rel, dataTup ) :
+        value = semiring.plus( value, self.getAnnotation( rel, tup, semiring, annotations ) )
+      return value
+
+    if self.isEDBOnly( rel ) :
+      facts = annotations.setdefault( rel, {} )
+      if not dataTup in facts :
+        facts[ dataTup ] = semiring.fact( rel, dataTup )
+      return facts[ dataTup ]
+
+    return annotations.get( rel, {} ).get( dataTup, semiring.zero() )
+
+
+  #########################
+  #  GET RELATION STRATA  #
+  #########################
+  # split the given idb relations into strata of mutually recursive relations
+  # through positive subgoals, ordered so every stratum follows the strata it
+  # depends on. returns a list of [ relation list, is recursive ] pairs.
+  # if negated, negated subgoals order the strata too.
+  # strata are the strongly connected components of the dependencies, see
+  # getComponents.
+  def getRelationStrata( self, rels, negated=False ) :
+
+    deps = {}
+    for rel in rels :
+      deps[ rel ] = []
+      for q in self.idb_rules.get( rel, [] ) :
+        if q in self.prov_rule_origins :
+          continue
+        for sub in self.getRule( q ).subgoals :
+          if sub[2] and not negated :
+            continue
+          dep = self.getBaseRelation( sub[0] )
+          if dep in rels and not dep in deps[ rel ] :
+            deps[ rel ].append( dep )
+
+    return self.getComponents( deps )
+
+
+  ####################
+  #  GET COMPONENTS  #
+  ####################
+  # split the nodes of the dependency graph deps, which maps every node to
+  # the list of nodes it depends on, into strongly connected components
+  # ordered so every component follows the components it depends on.
+  # returns a list of [ node list, is recursive ] pairs.
+  # components are found by an iterative version of tarjan's algorithm.
+  def getComponents( self, deps ) :
+
+    components = []
+    order      = {}
+    low        = {}
+    stack      = []
+    onStack    = set()
+
+    for root in sorted( deps ) :
+      if root in order :
+        continue
+
+      # frames are [ node, next dependency position ]
+      frames = [ [ root, 0 ] ]
+      order[ root ] = low[ root ] = len( order )
+      stack.append( root )
+      onStack.add( root )
+
+      while len( frames ) > 0 :
+        frame = frames[-1]
+        node  = frame[0]
+
+        if frame[1] < len( deps[ node ] ) :
+          dep       = deps[ node ][ frame[1] ]
+          frame[1] += 1
+          if not dep in order :
+            order[ dep ] = low[ dep ] = len( order )
+            stack.append( dep )
+            onStack.add( dep )
+            frames.append( [ dep, 0 ] )
+          elif dep in onStack :
+            low[ node ] = min( low[ node ], order[ dep ] )
+          continue
+
+        frames.pop()
+        if len( frames ) > 0 :
+          parent        = frames[-1][0]
+          low[ parent ] = min( low[ parent ], low[ node ] )
+
+        if low[ node ] == order[ node ] :
+          component = []
+          while True :
+            member = stack.pop()
+            onStack.discard( member )
+            component.append( member )
+            if member == node :
+              break
+          recursive = len( component ) > 1 or node in deps[ node ]
+          components.append( [ component, recursive ] )
+
+    return components
+
+
+  #######################
+  #  UPDATE PROVENANCE  #
+  #######################
+  # bring the evaluation results up to date with changes to edb relations,
+  # without evaluating the program again.
+  # inserts and deletes map edb relation names to lists of data tuples. the
+  # changes are expected to be applied to the database separately.
+  # the idb and _prov relations are maintained stratum by stratum with
+  # delete-and-rederive : records using a deleted tuple are deleted, the
+  # goals that lost a record are rederived from what remains, and the
+  # records using new or rederived tuples are joined in semi-naively.
+  # indexes are updated in place. the materialized graph is dropped and
+  # rebuilt on its next use.
+  # returns a dict mapping every changed relation to its
+  # [ inserted tuple keys, deleted tuple keys ].
+  # idb relations outside the dependencies of the declared provenance
+  # relations ( see setProvenanceRelations ) are not maintained.
+  def update_provenance( self, inserts=None, deletes=None ) :
+
+    changes = {}
+
+    # --------------------------------- #
+    # apply the edb changes
+
+    for changeList, inserted in [ [ deletes, False ], [ inserts, True ] ] :
+      if changeList is None :
+        continue
+
+      for rel in changeList :
+        if not rel in self.q.schema or not self.isEDBOnly( rel ) :
+          sys.exit( "ERROR : cannot update '" + str( rel ) + "', not an edb relation...aborting" )
+
+        for dataTup in changeList[ rel ] :
+          key = self.getTupKey( dataTup )
+          if inserted and self.insertRecord( rel, key ) :
+            self.recordChange( changes, rel, key, True )
+          elif not inserted and self.deleteRecord( rel, key ) :
+            self.recordChange( changes, rel, key, False )
+
+    # --------------------------------- #
+    # maintain the idb relations bottom-up
+
+    for stratum in self.getRelationStrata( self.prov_rules_by_rel.keys(), True ) :
+      provRules = []
+      for rel in stratum[0] :
+        provRules.extend( self.prov_rules_by_rel.get( rel, [] ) )
+
+      affected = False
+      for provRule in provRules :
+        for sub in self.getRule( provRule ).subgoals :
+          change = changes.get( self.getBaseRelation( sub[0] ) )
+          if not change is None and ( len( change[0] ) > 0 or len( change[1] ) > 0 ) :
+            affected = True
+
+      if affected :
+        self.maintainStratum( stratum[0], provRules, changes )
+
+    for rel in changes.keys() :
+      if len( changes[ rel ][0] ) == 0 and len( changes[ rel ][1] ) == 0 :
+        del changes[ rel ]
+      else :
+        changes[ rel ] = [ list( changes[ rel ][0] ), list( changes[ rel ][1] ) ]
+
+    # the cached results no longer match the evaluated database contents
+    if len( changes ) > 0 :
+      self.materialized_graph = None
+      self.cache_key          = None
+
+    logging.debug( "  UPDATE PROVENANCE : changed relations " + str( sorted( changes.keys() ) ) )
+    return changes
+
+
+  ######################
+  #  MAINTAIN STRATUM  #
+  ######################
+  # apply the net changes of the lower strata to the relations of one stratum
+  # and their provenance relations. see update_provenance.
+  def maintainStratum( self, rels, provRules, changes ) :
+
+    # lower strata changes, before this stratum adds its own
+    lower = {}
+    for rel in changes :
+      lower[ rel ] = [ list( changes[ rel ][0] ), list( changes[ rel ][1] ) ]
+
+    # --------------------------------- #
+    # delete the records using deleted tuples, or inserted negated tuples
+
+    overdeleted = []
+    worklist    = []
+    for provRule in provRules :
+      for i, sub in enumerate( self.getRule( provRule ).subgoals ) :
+        change = lower.get( self.getBaseRelation( sub[0] ) )
+        if change is None :
+          continue
+        for tup in change[ 0 if sub[2] else 1 ] :
+          worklist.append( [ provRule, i, tup ] )
+
+    while len( worklist ) > 0 :
+      item = worklist.pop()
+      for provTup in self.getMatchingProvTuples( item[0], item[1], item[2] ) :
+        if not self.deleteRecord( self.getRule( item[0] ).goalName, provTup ) :
+          continue
+        self.recordChange( changes, self.getRule( item[0] ).goalName, provTup, False )
+
+        rel   = self.getRule( self.prov_rule_origins[ item[0] ] ).goalName
+        width = len( self.getRule( self.prov_rule_origins[ item[0] ] ).goalAtts )
+        goal  = provTup[ :width ]
+        if not self.deleteRecord( rel, goal ) :
+          continue
+        self.recordChange( changes, rel, goal, False )
+        overdeleted.append( [ rel, goal ] )
+
+        # the deleted goal invalidates the records using it in this stratum
+        for provRule in provRules :
+          for i, sub in enumerate( self.getRule( provRule ).subgoals ) :
+            if not sub[2] and sub[0] == rel :
+              worklist.append( [ provRule, i, goal ] )
+
+    # --------------------------------- #
+    # rederive the deleted goals from the remaining tuples
+
+    delta = []
+    for entry in overdeleted :
+      rel  = entry[0]
+      goal = entry[1]
+      for provRule in self.prov_rules_by_rel.get( rel, [] ) :
+        width    = len( self.getRule( self.prov_rule_origins[ provRule ] ).goalAtts )
+        bindings = self.unifyAtts( self.getRule( provRule ).goalAtts[ :width ], goal, {} )
+        if not bindings is None :
+          self.addProvTuples( provRule, self.joinRule( provRule, bindings, None ), changes, delta )
+
+    # --------------------------------- #
+    # join in the records using inserted tuples, or deleted negated tuples
+
+    for provRule in provRules :
+      for i, sub in enumerate( self.getRule( provRule ).subgoals ) :
+        change = lower.get( self.getBaseRelation( sub[0] ) )
+        if change is None :
+          continue
+        for tup in change[ 1 if sub[2] else 0 ] :
+          bindings = self.unifyAtts( sub[1], tup, {} )
+          if not bindings is None :
+            skip = None if sub[2] else i
+            self.addProvTuples( provRule, self.joinRule( provRule, bindings, skip ), changes, delta )
+
+    while len( delta ) > 0 :
+      entry = delta.pop()
+      for provRule in provRules :
+        for i, sub in enumerate( self.getRule( provRule ).subgoals ) :
+          if sub[2] or not sub[0] == entry[0] :
+            continue
+          bindings = self.unifyAtts( sub[1], entry[1], {} )
+          if not bindings is None :
+            self.addProvTuples( provRule, self.joinRule( provRule, bindings, i ), changes, delta )
+
+
+  #####################
+  #  ADD PROV TUPLES  #
+  #####################
+  # insert new provenance records and their goals. goals which are not
+  # in their relation yet are queued on delta as [ relation, tuple key ].
+  # rederived goals are queued too, so the records using them are rebuilt.
+  def addProvTuples( self, provRule, provTups, changes, delta ) :
+
+    provGoal = self.getRule( provRule ).goalName
+    rel      = self.getRule( self.prov_rule_origins[ provRule ] ).goalName
+    width    = len( self.getRule( self.prov_rule_origins[ provRule ] ).goalAtts )
+
+    for provTup in provTups :
+      if self.insertRecord( provGoal, provTup ) :
+        self.recordChange( changes, provGoal, provTup, True )
+
+      goal = provTup[ :width ]
+      if self.insertRecord( rel, goal ) :
+        self.recordChange( changes, rel, goal, True )
+        delta.append( [ rel, goal ] )
+
+
+  ##############################
+  #  GET MATCHING PROV TUPLES  #
+  ##############################
+  # return the records of a provenance rule whose subgoal at position i
+  # matches the given tuple.
+  def getMatchingProvTuples( self, provRule, i, dataTup ) :
+
+    rule     = self.getRule( provRule )
+    bindings = self.unifyAtts( rule.subgoals[ i ][1], dataTup, {} )
+    if bindings is None :
+      return []
+
+    cols = []
+    key  = []
+    for pos in range( 0, len( rule.goalAtts ) ) :
+      att = rule.goalAtts[ pos ]
+      if att in bindings and not pos in cols :
+        cols.append( pos )
+        key.append( bindings[ att ] )
+
+    table = self.final_results_dict.get( rule.goalName, [] )
+    index = self.getIndex( rule.goalName, tuple( cols ) )
+    return [ table[ j ] for j in index.get( tuple( key ), [] ) ]
+
+
+  ###############
+  #  JOIN RULE  #
+  ###############
+  # return the provenance records of a rule consistent with the given
+  # variable bindings, joining the positive subgoals through the hash
+  # indexes of their relations. the positive subgoal at position skip is
+  # already accounted for by the bindings. negated subgoals are checked
+  # once the positive subgoals are joined.
+  def joinRule( self, provRule, bindings, skip ) :
+
+    rule      = self.getRule( provRule )
+    positives = []
+    negatives = []
+    for i, sub in enumerate( rule.subgoals ) :
+      if sub[2] :
+        negatives.append( sub )
+      elif not i == skip :
+        positives.append( sub )
+
+    provTups = []
+    worklist = [ [ bindings, positives ] ]
+    while len( worklist ) > 0 :
+      entry     = worklist.pop()
+      bindings  = entry[0]
+      remaining = entry[1]
+
+      if len( remaining ) > 0 :
+        sub = remaining[0]
+        for tup in self.getMatchingTuples( sub[0], sub[1], bindings ) :
+          newBindings = self.unifyAtts( sub[1], tup, bindings )
+          if not newBindings is None :
+            worklist.append( [ newBindings, remaining[1:] ] )
+        continue
+
+      holds = True
+      for sub in negatives :
+        if len( self.getMatchingTuples( self.getBaseRelation( sub[0] ), sub[1], bindings ) ) > 0 :
+          holds = False
+      if not holds :
+        continue
+
+      provTup = []
+      for att in rule.goalAtts :
+        if att in bindings :
+          provTup.append( bindings[ att ] )
+        else :
+          provTup.append( self.getTupKey( att )[0] )
+      provTups.append( tuple( provTup ) )
+
+    return provTups
+
+
+  #########################
+  #  GET MATCHING TUPLES  #
+  #########################
+  # return the tuples of rel matching the subgoal attributes under the bindings.
+  def getMatchingTuples( self, rel, atts, bindings ) :
+
+    cols = []
+    key  = []
+    for pos in range( 0, len( atts ) ) :
+      att = atts[ pos ]
+      if att == "_" :
+        continue
+      elif att in bindings :
+        cols.append( pos )
+        key.append( bindings[ att ] )
+      elif not self.isVariable( att ) :
+        cols.append( pos )
+        key.append( self.getTupKey( att )[0] )
+
+    table = self.final_results_dict.get( rel, [] )
+    if len( cols ) == 0 :
+      return list( table )
+
+    index = self.getIndex( rel, tuple( cols ) )
+    return [ table[ j ] for j in index.get( tuple( key ), [] ) ]
+
+
+  ################
+  #  UNIFY ATTS  #
+  ################
+  # extend bindings so the attribute list matches dataTup.
+  # returns the new bindings, or None if they conflict.
+  def unifyAtts( self, atts, dataTup, bindings ) :
+
+    newBindings = dict( bindings )
+    for pos in range( 0, len( atts ) ) :
+      att = atts[ pos ]
+      if att == "_" :
+        continue
+      elif self.isVariable( att ) :
+        if att in newBindings and not newBindings[ att ] == dataTup[ pos ] :
+          return None
+        newBindings[ att ] = dataTup[ pos ]
+      elif not self.getTupKey( att )[0] == dataTup[ pos ] :
+        return None
+
+    return newBindings
+
+
+  #################
+  #  IS VARIABLE  #
+  #################
+  # c4 variables start with an upper case letter
+  def isVariable( self, att ) :
+    return att[:1].isupper()
+
+
+  #######################
+  #  GET BASE RELATION  #
+  #######################
+  # strip the negation from a subgoal name, e.g. ' notin d' => 'd'
+  def getBaseRelation( self, subName ) :
+    return subName.split()[-1]
+
+
+  ###################
+  #  RECORD CHANGE  #
+  ###################
+  # note the insertion or deletion of dataTup in rel. a change undoing an
+  # earlier one cancels it, so changes only holds the net changes.
+  def recordChange( self, changes, rel, dataTup, inserted ) :
+
+    change = changes.setdefault( rel, [ set(), set() ] )
+    if inserted :
+      if dataTup in change[1] :
+        change[1].remove( dataTup )
+      else :
+        change[0].add( dataTup )
+    else :
+      if dataTup in change[0] :
+        change[0].remove( dataTup )
+      else :
+        change[1].add( dataTup )
+
+
+  ###################
+  #  INSERT RECORD  #
+  ###################
+  # append dataTup to rel in the evaluation results and in every index over rel.
+  # returns False if the record already exists.
+  def insertRecord( self, rel, dataTup ) :
+
+    table   = self.final_results_dict.setdefault( rel, [] )
+    dataSet = self.final_results_sets.setdefault( rel, set() )
+    if dataTup in dataSet :
+      return False
+
+    pos = len( table )
+    table.append( dataTup )
+    dataSet.add( dataTup )
+
+    for indexKey in self.results_indexes :
+      if indexKey[0] == rel :
+        key = tuple( [ dataTup[ c ] for c in indexKey[1] ] )
+        self.results_indexes[ indexKey ].setdefault( key, [] ).append( pos )
+
+    return True
+
+
+  ###################
+  #  DELETE RECORD  #
+  ###################
+  # remove dataTup from rel in the evaluation results and in every index
+  # over rel. the last record of the relation takes its position, so no
+  # other positions move. returns False if the record does not exist.
+  def deleteRecord( self, rel, dataTup ) :
+
+    dataSet = self.final_results_sets.get( rel )
+    if dataSet is None or not dataTup in dataSet :
+      return False
+
+    table   = self.final_results_dict[ rel ]
+    pos     = self.getIndex( rel, tuple( range( 0, len( dataTup ) ) ) )[ dataTup ][0]
+    lastPos = len( table ) - 1
+    last    = table[ lastPos ]
+
+    for indexKey in self.results_indexes :
+      if indexKey[0] == rel :
+        index    = self.results_indexes[ indexKey ]
+        key      = tuple( [ dataTup[ c ] for c in indexKey[1] ] )
+        postings = index[ key ]
+        postings.remove( pos )
+        if len( postings ) == 0 :
+          del index[ key ]
+
+        if not pos == lastPos :
+          lastKey      = tuple( [ last[ c ] for c in indexKey[1] ] )
+          postings     = index[ lastKey ]
+          postings[ postings.index( lastPos ) ] = pos
+
+    table[ pos ] = last
+    table.pop()
+    dataSet.remove( dataTup )
+
+    return True
+
+
+  ################
+  #  SAVE GRAPH  #
+  ################
+  # stream the graph to savePath plus the extension of every format in
+  # exportFormats ( see ProvExport ), e.g. savePath + ".jsonl", and
+  # render it to savePath + ".png" if render is set.
+  # returns the RenderJob of a background render, None otherwise.
+  def saveGraph( self, nodeSet, edgeSet, savePath, exportFormats=None, render=True ) :
+
+    if not exportFormats is None :
+      for fmt in exportFormats :
+        ProvExport.export( fmt, nodeSet, edgeSet, savePath + ProvExport.getExtension( fmt ) )
+
+    if render :
+      return self.renderGraph( nodeSet, edgeSet, savePath )
+
+
+  #####################
+  #  SET RENDER POOL  #
+  #####################
+  # render png files on a background RenderPool from now on and return it.
+  # the pool tracks the status of every render job. workers=None renders
+  # synchronously again. raises ImportError without concurrent.futures.
+  def setRenderPool( self, workers=2, maxPending=8, processes=False ) :
+
+    if workers is None :
+      self.render_pool = None
+    else :
+      self.render_pool = RenderPool.RenderPool( workers, maxPending, processes )
+
+    return self.render_pool
+
+
+  ##################
+  #  RENDER GRAPH  #
+  ##################
+  # save a png render of the given nodes and edges to savePath + ".png"
+  # with a render pool set, the render is queued and its RenderJob returned.
+  def renderGraph( self, nodeSet, edgeSet, savePath ) :
+
+    if not self.render_pool is None :
+      logging.debug( "  RENDER GRAPH : queueing prov tree render to " + str( savePath ) )
+      return self.render_pool.submit( nodeSet, edgeSet, savePath )
+
+    # --------------------------------- #
+    # create graph
+    graph = ProvGraph.toDot( nodeSet, edgeSet )
 
     # --------------------------------- #
     # output png
@@ -114,36 +1262,593 @@ class YProv( object ) :
     print "Saving prov tree render to " + str( savePath )
     graph.write_png( savePath + ".png" )
 
-    return graphData
+
+  ##########################
+  #  SUMMARIZE PROVENANCE  #
+  ##########################
+  # return a ProvSummary of the given [ nodeSet, edgeSet ] graph data, which
+  # collapses groups of more than maxSiblings siblings of the same node type
+  # and relation into aggregate nodes holding a count and sampleSize members.
+  # the summary's graph method yields the summarized graph for saveGraph,
+  # its expand method restores the members of an aggregate on demand.
+  def summarize_provenance( self, graphData, maxSiblings=10, sampleSize=ProvSummary.DEFAULT_SAMPLE_SIZE ) :
+    return ProvSummary.ProvSummary( graphData[0], graphData[1], maxSiblings, sampleSize )
+
+
+  ###############################
+  #  GENERATE PROVENANCE STATS  #
+  ###############################
+  # summarize the provenance of the given relation and data tuple without
+  # building a graph. returns a dict with
+  #   "derivations" : number of derivation trees of the tuple
+  #   "maxDepth"    : number of edges on the longest path of the graph
+  #   "facts"       : maps edb relations to the number of distinct facts used
+  #   "firings"     : maps provenance rules to the number of distinct firings
+  # every goal is summarized once and its counts are reused wherever it
+  # appears again, so the cost follows the size of the graph, not the
+  # number of derivations. back-edges are cut as in the "cut" cycle mode,
+  # so recursive programs count the derivations without repeated goals.
+  def generate_provenance_stats( self, rel, dataTup ) :
+
+    if not self.verifyRelTup( rel, dataTup ) :
+      sys.exit( "ERROR : input data tuple '" + str( dataTup ) + "' not in the evaluation results for relation '" + str( rel )+ "'" )
+
+    memo    = {}
+    onPath  = set()
+    facts   = {}
+    firings = {}
+
+    # frames are [ work item, child items, next child, count, depth ].
+    # goal frames sum the counts of their children, rule frames multiply them.
+    stack = []
+    value = self.openStatsItem( [ "goal", rel, self.getTupKey( dataTup ) ], memo, onPath, facts, firings, stack )
+
+    while len( stack ) > 0 :
+      frame = stack[-1]
+
+      # fold the value of the last closed child into its parent
+      if not value is None :
+        if frame[0][0] == "goal" :
+          frame[3] += value[0]
+        else :
+          frame[3] *= value[0]
+        if not value[1] is None :
+          frame[4] = max( frame[4], value[1] + 1 )
+        value = None
+
+      if frame[2] < len( frame[1] ) :
+        child     = frame[1][ frame[2] ]
+        frame[2] += 1
+        value     = self.openStatsItem( child, memo, onPath, facts, firings, stack )
+
+      else :
+        stack.pop()
+        value = [ frame[3], frame[4] ]
+        if frame[0][0] == "goal" :
+          goalKey = ( frame[0][1], frame[0][2] )
+          onPath.discard( goalKey )
+          memo[ goalKey ] = value
+
+    stats = {}
+    stats[ "derivations" ] = value[0]
+    stats[ "maxDepth" ]    = value[1]
+    stats[ "facts" ]       = dict( [ ( r, len( facts[ r ] ) ) for r in facts ] )
+    stats[ "firings" ]     = dict( [ ( r, len( firings[ r ] ) ) for r in firings ] )
+
+    return stats
+
+
+  #####################
+  #  OPEN STATS ITEM  #
+  #####################
+  # start summarizing a [ "goal", rel, tup ] or [ "rule", provenance rule, tup ] item.
+  # returns its [ count, depth ] if known right away, otherwise pushes a frame
+  # for its children onto the stack and returns None.
+  # goals cut on the current path count as [ 0, None ], i.e. no derivation and no edge.
+  def openStatsItem( self, item, memo, onPath, facts, firings, stack ) :
+
+    if item[0] == "rule" :
+      provGoal = self.getRule( item[1] ).goalName
+      firings.setdefault( provGoal, set() ).add( item[2] )
+
+      children    = []
+      subgoalData = self.mapTupData( item[1], item[2] )
+      for subName in subgoalData :
+        for firingTup in subgoalData[ subName ] :
+          children.append( [ "goal", subName, firingTup ] )
+
+      stack.append( [ item, children, 0, 1, 0 ] )
+      return None
+
+    rel     = item[1]
+    dataTup = item[2]
+    goalKey = ( rel, dataTup )
+
+    if goalKey in onPath :
+      return [ 0, None ]
+
+    elif goalKey in memo :
+      return memo[ goalKey ]
+
+    elif "_" in dataTup :
+      children = []
+      for tup in self.resolveWildcards( rel, dataTup ) :
+        children.append( [ "goal", rel, tup ] )
+
+    elif self.isEDBOnly( rel ) :
+      if "notin" in rel :
+        memo[ goalKey ] = [ 1, 0 ]
+      else :
+        facts.setdefault( rel, set() ).add( dataTup )
+        memo[ goalKey ] = [ 1, 1 ]
+      return memo[ goalKey ]
+
+    else :
+      children = []
+      for fr in self.getFiringRules( rel, dataTup ) :
+        for tup in self.getProvTuples( fr, dataTup ) :
+          children.append( [ "rule", fr, tup ] )
+
+      if len( children ) == 0 :
+        memo[ goalKey ] = [ 0, None ]
+        return memo[ goalKey ]
+
+    onPath.add( goalKey )
+    stack.append( [ item, children, 0, 0, 0 ] )
+    return None
+
+
+  ##########################
+  #  FIND MINIMAL WITNESS  #
+  ##########################
+  # return the cheapest set of edb facts deriving the given relation and
+  # data tuple, or None if it has no derivation. see find_cheapest_derivations.
+  def find_minimal_witness( self, rel, dataTup, costs=None ) :
+
+    derivations = self.find_cheapest_derivations( rel, dataTup, 1, costs )
+    if len( derivations ) == 0 :
+      return None
+
+    return derivations[0][1]
+
+
+  ###############################
+  #  FIND CHEAPEST DERIVATIONS  #
+  ###############################
+  # return up to k [ cost, witness ] pairs for the cheapest derivations of the
+  # given relation and data tuple, cheapest first. a witness is the frozenset
+  # of ( relation, tuple key ) pairs of the edb facts used by a derivation,
+  # and its cost is the sum of the costs of those facts. costs maps edb
+  # relations to the cost of each of their facts, 1 by default, so the
+  # first witness is a minimum-size set of facts.
+  # derivations with the same witness are reported once, and derivations
+  # which use a goal to derive itself are discarded.
+  # the search is an A* search over partial derivations, ordered by the cost
+  # of the facts chosen so far plus a lower bound on the cost of the facts
+  # the open goals still need ( see getDerivationBounds ). the bound never
+  # overestimates, so the search stops as soon as k complete derivations
+  # are popped.
+  def find_cheapest_derivations( self, rel, dataTup, k=1, costs=None ) :
+
+    if not self.verifyRelTup( rel, dataTup ) :
+      sys.exit( "ERROR : input data tuple '" + str( dataTup ) + "' not in the evaluation results for relation '" + str( rel )+ "'" )
+
+    if costs is None :
+      costs = {}
+
+    derivations = []
+    witnesses   = set()
+
+    # partial derivations are
+    # [ estimate, bound, tie breaker, cost, witness, open goals ].
+    # open goals are ( relation, tuple key, keys of the goals above it ).
+    # every occurrence of a goal is refined on its own, so each path of a
+    # derivation tree is checked for cycles. among equal estimates, the
+    # partial derivations closest to completion are refined first.
+    root     = ( rel, self.getTupKey( dataTup ), frozenset() )
+    bounds   = self.getDerivationBounds( root, costs )
+    counter  = 0
+    frontier = [ [ 0, 0, counter, 0, frozenset(), ( root, ) ] ]
+
+    while len( frontier ) > 0 and len( derivations ) < k :
+      state = heapq.heappop( frontier )
+
+      cost      = state[3]
+      witness   = state[4]
+      openGoals = state[5]
+
+      # +++++++++++++++++++++++++++++++++++++++++++++++++++++ #
+      # complete derivation
+
+      if len( openGoals ) == 0 :
+        if not witness in witnesses :
+          witnesses.add( witness )
+          derivations.append( [ cost, witness ] )
+        continue
+
+      # +++++++++++++++++++++++++++++++++++++++++++++++++++++ #
+      # refine the first open goal into one successor per alternative
+
+      goal      = openGoals[0]
+      rest      = openGoals[1:]
+      goalKey   = ( goal[0], goal[1] )
+      ancestors = goal[2]
+
+      successors = []
+
+      if goalKey in ancestors :
+        logging.debug( "  FIND CHEAPEST DERIVATIONS : discarding cyclic derivation through " + str( goalKey ) )
+
+      elif "notin" in goal[0] :
+        successors.append( [ cost, witness, rest ] )
+
+      elif "_" in goal[1] :
+        for tup in self.resolveWildcards( goal[0], goal[1] ) :
+          successors.append( [ cost, witness, ( ( goal[0], tup, ancestors ), ) + rest ] )
+
+      elif self.isEDBOnly( goal[0] ) :
+        if goalKey in witness :
+          successors.append( [ cost, witness, rest ] )
+        else :
+          successors.append( [ cost + costs.get( goal[0], 1 ), witness | frozenset( [ goalKey ] ), rest ] )
+
+      else :
+        subAncestors = ancestors | frozenset( [ goalKey ] )
+        for fr in self.getFiringRules( goal[0], goal[1] ) :
+          for provTup in self.getProvTuples( fr, goal[1] ) :
+            subgoals    = []
+            subgoalData = self.mapTupData( fr, provTup )
+            for subName in subgoalData :
+              for firingTup in subgoalData[ subName ] :
+                subgoals.append( ( subName, firingTup, subAncestors ) )
+            successors.append( [ cost, witness, tuple( subgoals ) + rest ] )
+
+      for successor in successors :
+        counter += 1
+        bound    = self.getOpenGoalsBound( successor[2], successor[1], bounds )
+        heapq.heappush( frontier, [ successor[0] + bound, bound, counter ] + successor )
+
+    return derivations
+
+
+  ###########################
+  #  GET DERIVATION BOUNDS  #
+  ###########################
+  # return [ lower bounds, facts ] for the goals reachable from the given
+  # root goal, computed once, bottom-up over the shared goal graph.
+  # lower bounds maps ( relation, tuple key ) pairs to a lower bound on the
+  # cost of the edb facts of any derivation of the goal, facts maps them to
+  # the frozenset of every edb fact reachable from the goal.
+  # the goals of a cycle start from a bound of 0 and are tightened for as
+  # many rounds as the cycle has goals, since any bound derived from lower
+  # bounds is a lower bound itself.
+  def getDerivationBounds( self, root, costs ) :
+
+    # --------------------------------- #
+    # collect the alternative subgoal lists of every reachable goal
+
+    alternatives = {}
+    facts        = set()
+    worklist     = [ ( root[0], root[1] ) ]
+    while len( worklist ) > 0 :
+      goalKey = worklist.pop()
+      if goalKey in alternatives :
+        continue
+
+      if "notin" in goalKey[0] :
+        alternatives[ goalKey ] = [ [] ]
+
+      elif "_" in goalKey[1] :
+        alternatives[ goalKey ] = [ [ ( goalKey[0], tup ) ] for tup in self.resolveWildcards( goalKey[0], goalKey[1] ) ]
+
+      elif self.isEDBOnly( goalKey[0] ) :
+        alternatives[ goalKey ] = []
+        facts.add( goalKey )
+
+      else :
+        alternatives[ goalKey ] = []
+        for fr in self.getFiringRules( goalKey[0], goalKey[1] ) :
+          for provTup in self.getProvTuples( fr, goalKey[1] ) :
+            subgoals    = []
+            subgoalData = self.mapTupData( fr, provTup )
+            for subName in subgoalData :
+              for firingTup in subgoalData[ subName ] :
+                subgoals.append( ( subName, firingTup ) )
+            alternatives[ goalKey ].append( subgoals )
+
+      for subgoals in alternatives[ goalKey ] :
+        worklist.extend( subgoals )
+
+    # --------------------------------- #
+    # bound the goals bottom-up
+
+    deps = {}
+    for goalKey in alternatives :
+      deps[ goalKey ] = []
+      for subgoals in alternatives[ goalKey ] :
+        deps[ goalKey ].extend( subgoals )
+
+    bounds = [ {}, {} ]
+    for component in self.getComponents( deps ) :
+      goalKeys = component[0]
+
+      # edb facts are never part of a cycle
+      if goalKeys[0] in facts :
+        bounds[0][ goalKeys[0] ] = costs.get( goalKeys[0][0], 1 )
+        bounds[1][ goalKeys[0] ] = frozenset( [ goalKeys[0] ] )
+        continue
+
+      reached = set()
+      for goalKey in goalKeys :
+        for dep in deps[ goalKey ] :
+          if dep in bounds[1] :
+            reached.update( bounds[1][ dep ] )
+      reached = frozenset( reached )
+
+      for goalKey in goalKeys :
+        bounds[0][ goalKey ] = 0
+        bounds[1][ goalKey ] = reached
+
+      rounds = 1
+      if component[1] :
+        rounds = len( goalKeys )
+
+      for i in range( 0, rounds ) :
+        for goalKey in goalKeys :
+          if len( alternatives[ goalKey ] ) > 0 :
+            bounds[0][ goalKey ] = min( [ self.getOpenGoalsBound( subgoals, frozenset(), bounds ) for subgoals in alternatives[ goalKey ] ] )
+
+    return bounds
+
+
+  ###########################
+  #  GET OPEN GOALS BOUND  #
+  ###########################
+  # return a lower bound on the cost of the edb facts outside of witness
+  # needed to derive all of the given goals, given the bounds of
+  # getDerivationBounds. goals reaching a fact of the witness may be free,
+  # and goals reaching a common fact may share it, so the bound is the sum
+  # over goals reaching pairwise disjoint facts outside of the witness, or
+  # the largest single bound if that is larger.
+  def getOpenGoalsBound( self, goals, witness, bounds ) :
+
+    total = 0
+    best  = 0
+    used  = set()
+    for goal in goals :
+      goalKey = ( goal[0], goal[1] )
+      bound   = bounds[0].get( goalKey, 0 )
+      facts   = bounds[1].get( goalKey, frozenset() )
+      if bound == 0 or not facts.isdisjoint( witness ) :
+        continue
+
+      best = max( best, bound )
+      if facts.isdisjoint( used ) :
+        total += bound
+        used.update( facts )
+
+    return max( total, best )
+
+
+  ########################
+  #  EXPLORE PROVENANCE  #
+  ########################
+  # return a ProvExplorer which yields the nodes and edges of the provenance
+  # graph for the given relation and data tuple lazily, on iteration.
+  # maxDepth bounds the number of edges between the root and expanded nodes.
+  # maxDerivations bounds the number of children expanded per goal.
+  # deferred children are produced on demand with the explorer's expand method.
+  def explore_provenance( self, rel, dataTup, maxDepth=None, maxDerivations=None, cycleMode="cut" ) :
+
+    if not self.verifyRelTup( rel, dataTup ) :
+      sys.exit( "ERROR : input data tuple '" + str( dataTup ) + "' not in the evaluation results for relation '" + str( rel )+ "'" )
+
+    if not cycleMode in CYCLE_MODES :
+      sys.exit( "ERROR : unrecognized cycle mode '" + str( cycleMode ) + "'...aborting" )
+
+    return ProvExplorer.ProvExplorer( self, rel, dataTup, maxDepth, maxDerivations, cycleMode )
 
 
   ###################
   #  GET PROV TREE  #
   ###################
-  def get_prov_tree( self, rel, dataTup, parentNodes ) :
+  # build the provenance graph for the given relation and data tuple.
+  # the traversal runs over an explicit worklist, depth first, and appends
+  # every node and edge into one shared node and edge store.
+  # memo maps ( relation, tuple key ) pairs to the goal node already
+  # created for them during this traversal ( None if the goal has no
+  # derivation ). a goal reached again is linked to its existing node
+  # instead of being expanded a second time, so the result is a DAG.
+  # recursive relations may reach a goal that is still being expanded,
+  # i.e. one on the current derivation path. cycleMode decides how such
+  # back-edges are handled ( see CYCLE_MODES ). either way every goal is
+  # expanded at most once, so the traversal terminates with a finite graph.
+  def get_prov_tree( self, rel, dataTup, parentNodes, memo=None, cycleMode="cut" ) :
 
     logging.debug( "  GET PROV TREE : rel         = " + str( rel ) )
     logging.debug( "  GET PROV TREE : dataTup     = " + str( dataTup ) )
     logging.debug( "  GET PROV TREE : parentNodes = " + str( parentNodes ) )
 
+    if not cycleMode in CYCLE_MODES :
+      sys.exit( "ERROR : unrecognized cycle mode '" + str( cycleMode ) + "'...aborting" )
+
+    nodeSet = []
+    edgeSet = []
+
+    if memo is None :
+      memo = {}
+
+    self.walkProvTree( [ [ "goal", rel, self.getTupKey( dataTup ), parentNodes ] ], memo, set(), nodeSet, edgeSet, cycleMode )
+
+    return [ nodeSet, edgeSet ]
+
+
+  ####################
+  #  WALK PROV TREE  #
+  ####################
+  # run the depth first traversal over the given work items, appending
+  # the new nodes and edges to nodeSet and edgeSet.
+  # work items are [ "goal", relation, tuple key, parent nodes ],
+  # [ "rule", provenance rule, provenance record, parent nodes ]
+  # or [ "exit", goal key ], which closes the subtree of a goal.
+  # onPath holds the goals whose subtrees are still being expanded.
+  def walkProvTree( self, items, memo, onPath, nodeSet, edgeSet, cycleMode ) :
+
+    # children are pushed in reverse so they pop in derivation order.
+    worklist = list( reversed( items ) )
+
+    while len( worklist ) > 0 :
+      item = worklist.pop()
+
+      if item[0] == "exit" :
+        onPath.discard( item[1] )
+        continue
+
+      elif item[0] == "goal" :
+        children = self.expandGoal( item[1], item[2], item[3], memo, nodeSet, edgeSet, onPath, cycleMode )
+      else :
+        children = self.expandRule( item[1], item[2], item[3], nodeSet, edgeSet )
+
+      children.reverse()
+      worklist.extend( children )
+
+
+  ############################
+  #  GET PROV TREE PARALLEL  #
+  ############################
+  # build the same provenance graph as get_prov_tree on a pool of worker
+  # processes. the top of the graph is expanded breadth first in this
+  # process until at least PARALLEL_SEED_FACTOR work items per worker are
+  # pending. each pending item is an independent subtree, which a worker
+  # expands against its forked, read-only copy of the result store.
+  # the partial graphs are merged in item order, dropping nodes and edges
+  # already present, so goals shared between subtrees appear once.
+  # node and edge order differs from get_prov_tree. in cut mode, back-edges
+  # are cut along each subtree's own derivation path, so recursive programs
+  # can keep edges that the sequential traversal order cut.
+  def get_prov_tree_parallel( self, rel, dataTup, parentNodes, workers=None, cycleMode="cut" ) :
+
+    if not cycleMode in CYCLE_MODES :
+      sys.exit( "ERROR : unrecognized cycle mode '" + str( cycleMode ) + "'...aborting" )
+
+    if concurrent is None :
+      raise ImportError( "parallel provenance depends upon the concurrent.futures module. On python 2, please install the futures backport, e.g. 'pip install futures'" )
+
+    if workers is None :
+      workers = multiprocessing.cpu_count()
+
     nodeSet = []
     edgeSet = []
+    memo    = {}
+
+    # --------------------------------- #
+    # expand the top of the graph breadth first.
+    # pending entries are [ work item, keys of the goals above it ].
+
+    pending = [ [ [ "goal", rel, self.getTupKey( dataTup ), parentNodes ], frozenset() ] ]
+    while len( pending ) > 0 and len( pending ) < workers * PARALLEL_SEED_FACTOR :
+      nextPending = []
+      for entry in pending :
+        item      = entry[0]
+        ancestors = entry[1]
+
+        if item[0] == "goal" :
+          children  = self.expandGoal( item[1], item[2], item[3], memo, nodeSet, edgeSet, set( ancestors ), cycleMode )
+          ancestors = ancestors | frozenset( [ ( item[1], item[2] ) ] )
+        else :
+          children  = self.expandRule( item[1], item[2], item[3], nodeSet, edgeSet )
+
+        for child in children :
+          if not child[0] == "exit" :
+            nextPending.append( [ child, ancestors ] )
+
+      pending = nextPending
+
+    if len( pending ) == 0 :
+      return [ nodeSet, edgeSet ]
+
+    # --------------------------------- #
+    # expand the pending subtrees in worker processes
+
+    logging.debug( "  GET PROV TREE PARALLEL : expanding " + str( len( pending ) ) + " subtrees on " + str( workers ) + " workers" )
+
+    ProvWorker.SNAPSHOT = self
+    try :
+      with concurrent.futures.ProcessPoolExecutor( max_workers=workers ) as pool :
+        futures = []
+        for entry in pending :
+          ancestorNodes = {}
+          for goalKey in entry[1] :
+            ancestorNodes[ goalKey ] = memo[ goalKey ]
+          futures.append( pool.submit( ProvWorker.expandSubtree, entry[0], ancestorNodes, cycleMode ) )
+
+        partialGraphs = [ f.result() for f in futures ]
+    finally :
+      ProvWorker.SNAPSHOT = None
+
+    # --------------------------------- #
+    # merge partial graphs
+
+    nodeNames = set( [ n.get_name() for n in nodeSet ] )
+    edgeNames = set( [ ( e.get_source(), e.get_destination() ) for e in edgeSet ] )
+    for graphData in partialGraphs :
+      for n in graphData[0] :
+        if not n.get_name() in nodeNames :
+          nodeNames.add( n.get_name() )
+          nodeSet.append( n )
+      for e in graphData[1] :
+        edgeName = ( e.get_source(), e.get_destination() )
+        if not edgeName in edgeNames :
+          edgeNames.add( edgeName )
+          edgeSet.append( e )
+
+    return [ nodeSet, edgeSet ]
+
+
+  #################
+  #  EXPAND GOAL  #
+  #################
+  # create the node for a single goal, link it to its parents and
+  # return the work items for its children.
+  # goals with children are added to onPath until their exit item pops.
+  # dataTup is a tuple key ( see getTupKey ).
+  def expandGoal( self, rel, dataTup, parentNodes, memo, nodeSet, edgeSet, onPath=None, cycleMode="cut" ) :
+
+    children = []
+
+    goalKey = ( rel, dataTup )
+
+    # ----------------------------------------------------- #
+    # CYCLE CASE : goal is on the current derivation path
+    if not onPath is None and goalKey in onPath :
+
+      thisNode = memo[ goalKey ]
+      logging.debug( "  EXPAND GOAL : back-edge to " + str( goalKey ) + " handled in mode '" + cycleMode + "'" )
+      if cycleMode == "link" :
+        for node in parentNodes :
+          edgeSet.append( self.createEdge( node, thisNode ) )
+
+    # ----------------------------------------------------- #
+    # MEMO CASE : goal already expanded
+    elif goalKey in memo :
+
+      thisNode = memo[ goalKey ]
+      if not thisNode is None :
+        for node in parentNodes :
+          edgeSet.append( self.createEdge( node, thisNode ) )
 
     # ----------------------------------------------------- #
     # RECURSIVE CASE : data tuple contains wildcards
-    if "_" in dataTup :
+    elif "_" in dataTup :
 
       thisNode = self.createNode( rel, dataTup, "goal" )
       nodeSet.append( thisNode )
       for node in parentNodes :
         edgeSet.append( self.createEdge( node, thisNode ) )
+      memo[ goalKey ] = thisNode
 
-      resolvedTups = self.resolveWildcards( rel, dataTup )
-
-      for tup in resolvedTups :
-        graphData = self.get_prov_tree( rel, tup, [ thisNode ] )
-        nodeSet.extend( graphData[0] )
-        edgeSet.extend( graphData[1] )
+      for tup in self.resolveWildcards( rel, dataTup ) :
+        children.append( [ "goal", rel, tup, [ thisNode ] ] )
 
     # ----------------------------------------------------- #
     # BASE CASE : relation has only an edb definition
@@ -154,6 +1859,7 @@ class YProv( object ) :
       nodeSet.append( thisGoalNode )
       for node in parentNodes :
         edgeSet.append( self.createEdge( node, thisGoalNode ) )
+      memo[ goalKey ] = thisGoalNode
 
       # only positive provenance
       if not "notin" in rel :
@@ -170,29 +1876,20 @@ class YProv( object ) :
       # +++++++++++++++++++++++++++++++++++++++++++++++++++++ #
       # grab all provenance idb rules for this relation
 
-      idbList = []
-      for q in self.q.queryList :
-         q_goal_name = self.getGoalName( q )
-         if "_prov" in q_goal_name and q_goal_name[:len(rel)] == rel :
-           idbList.append( q )
-
-      #print "idList = " + str( idbList )
-
-      # +++++++++++++++++++++++++++++++++++++++++++++++++++++ #
       # find the provenance versions of the 
       # idb rule(s) responsible for firing this tuple
 
-      firingRules = []
-      for q in idbList :
-        if self.isCandidateFiringRule( q, dataTup ) :
-          firingRules.append( q )
+      firingRules = self.getFiringRules( rel, dataTup )
 
       #print "firingRules = " + str( firingRules )
 
+      if len( firingRules ) == 0 :
+        memo[ goalKey ] = None
+
       # +++++++++++++++++++++++++++++++++++++++++++++++++++++ #
       # create goal node for relation and data tuple
 
-      if len( firingRules ) > 0 :
+      else :
         thisNode =  self.createNode( rel, dataTup, "goal" )
         nodeSet.append( thisNode )
 
@@ -200,41 +1897,68 @@ class YProv( object ) :
         # create an edge between this node and all parent nodes
         for node in parentNodes :
           edgeSet.append( self.createEdge( node, thisNode ) )
+        memo[ goalKey ] = thisNode
 
         # +++++++++++++++++++++++++++++++++++++++++++++++++++++ #
-        # create edge nodes between the goal node and all relevant idb provenance
-        # _RULES_.
-        # the rule nodes become the parent nodes in the appropriate subsequent
-        # recusrive calls. 
-        # launch recursive calls on each idb subgoals grounded in the relevant tuples.
+        # queue one rule item per aligned prov tuple of each
+        # relevant idb provenance _RULE_.
+        # the goal node becomes the parent of the rule nodes.
 
         for fr in firingRules :
+          for tup in self.getProvTuples( fr, dataTup ) :
+            children.append( [ "rule", fr, tup, [ thisNode ] ] )
 
-          # get all aligned prov tuples
-          provTuples = self.getProvTuples( fr, dataTup )
+    # keep the goal on the path until all of its children are expanded
+    if len( children ) > 0 and not onPath is None :
+      onPath.add( goalKey )
+      children.append( [ "exit", goalKey ] )
 
-          for tup in provTuples :
+    return children
 
-            # create firing rule node
-            frNode = self.createNode( self.getGoalName( fr ), "[" + tup + "]", "rule"  )
-            nodeSet.append( frNode )
 
-            # create firing rule edge
-            edgeSet.append( self.createEdge( thisNode, frNode ) )
+  #################
+  #  EXPAND RULE  #
+  #################
+  # create the node for a single rule firing, link it to its goal node and
+  # return the work items for the subgoals grounded in the provenance tuple.
+  def expandRule( self, firingRule, provTup, parentNodes, nodeSet, edgeSet ) :
 
-            # iterate over grounded subgoals
-            subgoalData = self.mapTupData( fr, tup )
-            for subName in subgoalData :
-              firingTup = subgoalData[ subName ]
-              #print firingTup
+    children = []
 
-              # get the subgraph
-              graphData = self.get_prov_tree( subName, firingTup, [ frNode ] )
-              nodeSet.extend( graphData[0] )
-              edgeSet.extend( graphData[1] )
+    # create firing rule node
+    frNode = self.createNode( self.getRule( firingRule ).goalName, provTup, "rule"  )
+    nodeSet.append( frNode )
 
-    print "returning [ nodeSet, edgeSet ] = " + str( [ nodeSet, edgeSet ] )
-    return [ nodeSet, edgeSet ]
+    # create firing rule edge
+    for node in parentNodes :
+      edgeSet.append( self.createEdge( node, frNode ) )
+
+    # iterate over grounded subgoals
+    subgoalData = self.mapTupData( firingRule, provTup )
+    for subName in subgoalData :
+      for firingTup in subgoalData[ subName ] :
+        #print firingTup
+        children.append( [ "goal", subName, firingTup, [ frNode ] ] )
+
+    return children
+
+
+  ######################
+  #  GET FIRING RULES  #
+  ######################
+  # return the provenance rules of the relation which could have fired dataTup.
+  # raises ValueError if rel has no provenance rules.
+  def getFiringRules( self, rel, dataTup ) :
+
+    if not rel in self.prov_rules_by_rel :
+      raise ValueError( "relation '" + str( rel ) + "' has no provenance rules, declare it with setProvenanceRelations" )
+
+    firingRules = []
+    for q in self.prov_rules_by_rel[ rel ] :
+      if self.isCandidateFiringRule( q, dataTup ) :
+        firingRules.append( q )
+
+    return firingRules
 
 
   #######################
@@ -242,26 +1966,26 @@ class YProv( object ) :
   #######################
   # given a data tuple with wildcards, return the list of tuples in the relation
   # corresponding with the wildcard tuple.
+  # the matching records are found with one probe of the hash index over
+  # the bound positions of the data tuple, keyed on their values.
+  # dataTup is a tuple key ( see getTupKey ).
   def resolveWildcards( self, rel, dataTup ) :
 
     logging.debug( "  RESOLVE WILDCARDS : rel     = " + rel )
     logging.debug( "  RESOLVE WILDCARDS : dataTup = " + str( dataTup ) )
 
+    table = self.final_results_dict[ rel ]
+
+    # postings are in table order, so the result is too.
+    cols = tuple( [ i for i in range( 0, len( dataTup ) ) if not dataTup[ i ] == "_" ] )
+    if len( cols ) == 0 :
+      matches = range( 0, len( table ) )
+    else :
+      matches = self.getIndex( rel, cols ).get( tuple( [ dataTup[ i ] for i in cols ] ), [] )
+
     tupList = []
-    for record in self.final_results_dict[ rel ] :
-      #print "record = " + str( record )
-      record = record.split( "," )
-      flag = True
-      for i in range( 0, len(record) ) :
-        component = record[ i ]
-        data      = dataTup[ i ]
-        if data == "_" :
-          pass
-        elif not component == data :
-          flag = False
-          break
-      if flag :
-        tupList.append( record )
+    for i in matches :
+      tupList.append( table[ i ] )
 
     logging.debug( "  RESOLVE WILDCARDS : tupList = " + str( tupList ) )
     return tupList
@@ -270,30 +1994,23 @@ class YProv( object ) :
   ##################
   #  MAP TUP DATA  #
   ##################
-  # map data tuple values to tuples of data in subgoals
+  # map data tuple values to tuples of data in subgoals.
+  # returns a dict mapping each subgoal name to the list of grounded tuples
+  # for its occurrences in the rule body, e.g. path(X,Z), path(Z,Y).
   def mapTupData( self, firingRule, provDataTup ) :
 
-    provDataTup = provDataTup.split( "," )
-    subgoalList = self.getSubgoals( firingRule )
-
-    # generate dict mapping universal attributes in the firing rule to data from dataTup
-    goalAtts = self.getGoalAtts( firingRule )
-    univDataMap = {}
-    for i in range( 0, len( goalAtts ) ) :
-      att                = goalAtts[ i ]
-      univDataMap[ att ] = provDataTup[ i ]
-
+    # subgoal attributes are precompiled into positions in the goal attribute list
     subgoalMap = {}
-    for subgoal in subgoalList :
-      subName = subgoal[0]
-      subAtts = subgoal[1]
-      dataList = []
-      for att in subAtts :
-        if att == "_" :
+    for subgoal in self.getRule( firingRule ).subgoalMaps :
+      subName      = subgoal[0]
+      subPositions = subgoal[1]
+      dataList     = []
+      for pos in subPositions :
+        if pos is None :
           dataList.append( "_" )
         else :
-          dataList.append( univDataMap[ att ] )
-      subgoalMap[ subName ] = dataList 
+          dataList.append( provDataTup[ pos ] )
+      subgoalMap.setdefault( subName, [] ).append( tuple( dataList ) )
 
     #print subgoalMap
     return subgoalMap
@@ -310,17 +2027,18 @@ class YProv( object ) :
     validTups = []
 
     # get goal name
-    provGoalName = self.getGoalName( firingRule )
+    provGoalName = self.getRule( firingRule ).goalName
 
     #print firingRule
     #print dataTup
     #print provGoalName
 
-    # collect aligned data tuples
-    for tup in self.final_results_dict[ provGoalName ] :
-      if self.provAlignment( tup, dataTup ) :
-        #print "prov tup '" + str( tup ) + "' aligns with dataTup '" + str( dataTup ) + "'"
-        validTups.append( tup )
+    # collect aligned data tuples with a single probe on the prefix index
+    key   = dataTup
+    index = self.getIndex( provGoalName, tuple( range( 0, len( key ) ) ) )
+    table = self.final_results_dict[ provGoalName ]
+    for i in index.get( key, [] ) :
+      validTups.append( table[ i ] )
 
     #print validTups
     logging.debug( "  GET PROV TUPLES : validTups = " + str( validTups ) )
@@ -351,63 +2069,72 @@ class YProv( object ) :
     # varables appears after the list of universal variables in the provenance 
     # rules.
 
-    provGoal = self.getGoalName( provMatch )
+    provGoal = self.getRule( provMatch ).goalName
     #print "provgoal = " + provGoal
 
-    for tup in self.final_results_dict[ provGoal ] :
-      if self.provAlignment( tup, dataTup ) :
-        return True
+    key   = dataTup
+    index = self.getIndex( provGoal, tuple( range( 0, len( key ) ) ) )
 
-    return False
+    return key in index
 
 
-  ####################
-  #  PROV ALIGNMENT  #
-  ####################
-  # determine if the first N entries in the provenance tuple are identical (align)
-  # with the first N entries in the data tuple, where N is the length of the 
-  # data tuple.
-  def provAlignment( self, provTup, dataTup ) :
-
-    # covert dataTup to string and split into a list of strings
-    dataTup = str( dataTup )
-    dataTup = dataTup.translate( None, string.whitespace )
-    dataTup = dataTup.replace( "[", "" )
-    dataTup = dataTup.replace( "]", "" )
-    dataTup = dataTup.replace( '"', '' )
-    dataTup = dataTup.replace( "'", "" )
-    dataTup = dataTup.split( "," )
-
-    # split provenance string into list of strings
-    provTup = provTup.split( "," )
-
-    logging.debug( "  PROV ALIGNMENT : provTup = " + str( provTup ) )
-    logging.debug( "  PROV ALIGNMENT : dataTup = " + str( dataTup ) )
-
-    for i in range( 0, len( dataTup ) ) :
-        dData = dataTup[ i ]
-        pData = provTup[ i ]
-        #print "dData '" + dData + "', pData '" + pData + "'"
-        if dData == pData :
-          pass
-        else :
-          return False
+  ###############
+  #  GET INDEX  #
+  ###############
+  # return a hash index over the given columns of a relation in the
+  # evaluation results, mapping each tuple of column values to the list
+  # of positions of the matching records in final_results_dict.
+  # indexes are built lazily, once per relation and column list.
+  def getIndex( self, rel, cols ) :
 
-    return True
+    index = self.results_indexes.get( ( rel, cols ) )
+    if index is None :
+      index = {}
+      table = self.final_results_dict.get( rel, [] )
+      for i in range( 0, len( table ) ) :
+        record = table[ i ]
+        key    = tuple( [ record[ c ] for c in cols ] )
+        index.setdefault( key, [] ).append( i )
+
+      self.results_indexes[ ( rel, cols ) ] = index
+      logging.debug( "  GET INDEX : indexed relation '" + rel + "' on columns " + str( cols ) )
+
+    return index
+
+
+  #################
+  #  GET TUP KEY  #
+  #################
+  # convert a data tuple into its canonical key : an immutable tuple of
+  # interned strings. the evaluation results store their records in the
+  # same form, so keys compare directly against stored records.
+  # dataTup may be a list or tuple of values, or a comma-delimited string.
+  # only inputs from callers need converting. the traversal routines pass
+  # keys and stored records around, which are canonical already.
+  def getTupKey( self, dataTup ) :
+
+    if isinstance( dataTup, basestring ) :
+      dataTup = dataTup.split( "," )
+
+    key = []
+    for data in dataTup :
+      key.append( intern( str( data ).translate( None, KEY_DELETE_CHARS ) ) )
+
+    return tuple( key )
 
 
   ####################
   #  GET PROV MATCH  #
   ####################
+  # return the provenance rule generated for the given idb rule.
+  # provenance rules map to themselves.
   def getProvMatch( self, idbRule ) :
 
-    for query in self.q.queryList :
-      if "_prov" in self.getGoalName( query ) :
-        qBody   = self.getBody( query )
-        idbBody = self.getBody( idbRule )
+    if idbRule in self.prov_rules :
+      return self.prov_rules[ idbRule ]
 
-        if qBody == idbBody :
-          return query
+    if idbRule in self.prov_rule_origins :
+      return idbRule
 
     sys.exit( "ERROR : idb rule '" + idbRule + "' has no corresponding provenance rule...aborting" )
 
@@ -416,15 +2143,7 @@ class YProv( object ) :
   #  GET BODY  #
   ##############
   def getBody( self, query ) :
-
-    body = query.replace( "notin", "___NOTIN___" )
-    body = body.replace( ";", "" )
-    body = body.translate( None, string.whitespace )
-    body = body.split( ":-" )
-    body = body[1]
-    body = body.replace( "___NOTIN___", " notin " )
-
-    return body
+    return self.getRule( query ).body
 
 
   #################
@@ -432,27 +2151,9 @@ class YProv( object ) :
   #################
   def createNode( self, rel, dataTup, nodeType ) :
 
-    label = rel + str( dataTup )
-    label = label.replace( "notin", "___NOTIN___" )
-    label = label.replace( "'", "" )
-    label = label.replace( '"', '' )
-    label = label.replace( '[', '(' )
-    label = label.replace( ']', ')' )
-    label = label.translate( None, string.whitespace )
-    label = label.replace( "___NOTIN___", "notin " )
-    logging.debug( "  CREATE NODE : label = " + label )
-
-    # CASE : fact
-    if nodeType == "fact" :
-      return pydot.Node( "F_"+label, shape='cylinder', margin=0.1 )
-
-    # CASE : goal
-    elif nodeType == "goal" :
-      return pydot.Node( "G_"+label, shape='oval', margin=0.1 )
-
-    # CASE : rule
-    elif nodeType == "rule" :
-      return pydot.Node( "R_"+label, shape='box', margin=0.1 )
+    # CASE : fact, goal or rule
+    if nodeType in ProvGraph.NODE_STYLES :
+      return ProvGraph.ProvNode( nodeType, rel, dataTup )
 
     # CASE : wtf???
     else :
@@ -465,8 +2166,7 @@ class YProv( object ) :
   #################
   # create an edge from e1 to e2
   def createEdge( self, e1, e2 ) :
-    logging.debug( "  CREATE EDGE : src = " + str( e1.get_name() ) + ", dest = " + str( e2.get_name() )  )
-    return pydot.Edge( e1, e2 )
+    return ProvGraph.ProvEdge( e1, e2 )
 
 
   #################
@@ -477,11 +2177,39 @@ class YProv( object ) :
   # will not appear as rule goals.
   def isEDBOnly( self, rel ) :
 
+    if self.idb_rules is None :
+      self.buildCatalog()
+
+    return not rel in self.idb_rules
+
+
+  ###################
+  #  BUILD CATALOG  #
+  ###################
+  # index the rules in the quest instance by goal name. relations without
+  # rules are edb relations ( see isEDBOnly ). provenance rules registered
+  # in run() are additionally indexed by the goal name of their original rule.
+  def buildCatalog( self ) :
+
+    self.idb_rules         = {}
+    self.prov_rules_by_rel = {}
+
+    if self.prov_rules is None :
+      self.prov_rules        = {}
+      self.prov_rule_origins = {}
+
     for q in self.q.queryList :
-      goalName = self.getGoalName( q )
-      if goalName == rel :
-        return False
-    return True
+      if not self.magic_rules is None and q in self.magic_rules :
+        continue
+
+      goalName = self.getRule( q ).goalName
+      self.idb_rules.setdefault( goalName, [] ).append( q )
+
+      if q in self.prov_rule_origins :
+        origGoalName = self.getRule( self.prov_rule_origins[ q ] ).goalName
+        self.prov_rules_by_rel.setdefault( origGoalName, [] ).append( q )
+
+    logging.debug( "  BUILD CATALOG : idb relations = " + str( self.idb_rules.keys() ) )
 
 
   ####################
@@ -491,29 +2219,13 @@ class YProv( object ) :
   # return True if tuple found in results, False otherwise
   def verifyRelTup( self, rel, dataTup ) :
 
-    # convert dataTup into list of strings
-    dataTup = str( dataTup )
-    dataTup = dataTup.translate( None, string.whitespace ) # strings with whitespace not allowed
-    dataTup = dataTup.replace( "[", "" )
-    dataTup = dataTup.replace( "]", "" )
-    dataTup = dataTup.replace( '"', '' )
-    dataTup = dataTup.replace( "'", "" )
-    dataTup = dataTup.split( "," )
+    # convert dataTup into a tuple key
+    dataTup = self.getTupKey( dataTup ) # strings with whitespace not allowed
 
     logging.debug( "  VERIFY REL TUP : rel     = " + rel )
     logging.debug( "  VERIFY REL TUP : dataTup = " + str( dataTup ) )
 
-    flag = False
-
-    print self.final_results_dict
-
-    for tup in self.final_results_dict[ rel ] :
-      tup = tup.split( "," )
-      print "tup = " + str( tup )
-      if tup == dataTup :
-        flag = True
-
-    return flag
+    return dataTup in self.final_results_sets.get( rel, () )
 
 
   #########
@@ -527,9 +2239,31 @@ class YProv( object ) :
     # --------------------------------- #
     # build provenance queries and schemas
 
+    self.prov_rules        = {}
+    self.prov_rule_origins = {}
+
+    provRels = None
+    if not self.prov_relations is None :
+      self.buildCatalog()
+      for rel in self.prov_relations :
+        if not rel in self.q.schema and not rel in self.idb_rules :
+          sys.exit( "ERROR : unrecognized provenance relation '" + str( rel ) + "'...aborting" )
+      # relations used under negation get provenance rules as well, so
+      # update_provenance can maintain them.
+      provRels = self.getDependencyClosure( self.prov_relations, True )
+      logging.debug( "  RUN : building provenance rules for " + str( sorted( provRels ) ) )
+
     prov_queries_schemas = []
     for query in self.q.queryList :
 
+      # magic rules only restrict the evaluation
+      if not self.magic_rules is None and query in self.magic_rules :
+        continue
+
+      # other relations are evaluated without provenance
+      if not provRels is None and not self.getRule( query ).goalName in provRels :
+        continue
+
       # build provenance rule
       prov_query = self.buildProvQuery( query )
       logging.debug( "  RUN : prov_query = " + str( prov_query ) )
@@ -538,6 +2272,9 @@ class YProv( object ) :
       logging.debug( "  RUN : query schema '" + str( prov_schema )+ "'" )
 
       prov_queries_schemas.append( [ prov_query, prov_schema ] )
+
+      self.prov_rules[ query ]             = prov_query
+      self.prov_rule_origins[ prov_query ] = query
  
     # --------------------------------- #
     # add provenance query and schema
@@ -548,6 +2285,7 @@ class YProv( object ) :
       prov_schema = pq[1]
 
       self.q.setQuery( prov_query )
+      self.getRule( prov_query )
       logging.debug( "  RUN : set query '" + prov_query + "'" )
  
       rel    = prov_schema[0] 
@@ -555,6 +2293,33 @@ class YProv( object ) :
       self.q.setSchema( rel, schema )
       logging.debug( "  RUN : set relation '" + rel + "' to schema " + str( schema ) )
 
+    # --------------------------------- #
+    # index rules and relations
+
+    self.buildCatalog()
+    self.materialized_graph = None
+
+    # --------------------------------- #
+    # reuse cached evaluation results
+
+    self.cache_key = None
+    if not self.results_cache is None :
+      self.cache_key = self.getCacheKey()
+
+    if not self.cache_key is None :
+      cached = self.results_cache.get( self.cache_key )
+      if not cached is None :
+        self.final_program       = cached[0]
+        self.final_table_list    = cached[1]
+        self.final_results_array = cached[2]
+        self.final_results_dict  = cached[3]
+        self.results_indexes     = cached[4]
+        self.internResults()
+        self.final_results_sets  = self.getResultsSets( self.final_results_dict )
+
+        logging.debug( "  RUN : reused cached evaluation results '" + self.cache_key + "'" )
+        return [ self.final_program, self.final_table_list, self.final_results_array ]
+
     # --------------------------------- #
     # run query evaluation
 
@@ -564,89 +2329,360 @@ class YProv( object ) :
     self.final_table_list    = allProgramData[1]
     self.final_results_array = allProgramData[2]
     self.final_results_dict  = self.getResultsDict()
+    self.final_results_sets  = self.getResultsSets( self.final_results_dict )
+    self.results_indexes     = {}
+
+    self.saveCache()
 
     return allProgramData
 
 
+  #######################
+  #  RUN GOAL DIRECTED  #
+  #######################
+  # evaluate only what the provenance of the given relation and data tuple
+  # needs, instead of the whole program. the rules are rewritten with magic
+  # sets : the values of dataTup other than "_" are bound and the bindings
+  # are passed sideways, left to right, into the rules of the idb relations
+  # the target depends on ( see getAdornments ). rules the target does not
+  # depend on are dropped, so their relations evaluate empty. the provenance rules are built from the rewritten
+  # rules, so they are restricted the same way, but their compiled subgoals
+  # hide the magic guards, so provenance graphs look as after run().
+  # call instead of run(), before the program is evaluated.
+  def run_goal_directed( self, rel, dataTup ) :
+
+    if self.prov_rules :
+      sys.exit( "ERROR : run_goal_directed must be called before the program is evaluated...aborting" )
+
+    rules = {}
+    for query in self.q.queryList :
+      rules.setdefault( self.getRule( query ).goalName, [] ).append( query )
+
+    if not rel in rules :
+      sys.exit( "ERROR : relation '" + str( rel ) + "' is not an idb relation...aborting" )
+
+    if not rel in self.q.schema or len( self.q.schema[ rel ] ) != len( dataTup ) :
+      sys.exit( "ERROR : input data tuple '" + str( dataTup ) + "' does not match the schema of relation '" + str( rel ) + "'...aborting" )
+
+    # --------------------------------- #
+    # name the magic relations
+
+    adornments = self.getAdornments( rules, rel, dataTup )
+    magicNames = {}
+    for r in adornments :
+      if len( adornments[ r ] ) > 0 :
+        magicNames[ r ] = "magic_" + r
+        if magicNames[ r ] in self.q.schema or magicNames[ r ] in rules :
+          sys.exit( "ERROR : relation name '" + magicNames[ r ] + "' is reserved for magic sets...aborting" )
+
+    self.magic_relations = set( magicNames.values() )
+    self.magic_rules     = set()
+
+    # --------------------------------- #
+    # guard the rules of restricted relations and
+    # derive the bindings of their subgoals
+
+    queryList  = []
+    magicRules = []
+    for query in self.q.queryList :
+      rule = self.getRule( query )
+      if not rule.goalName in adornments :
+        logging.debug( "  RUN GOAL DIRECTED : dropped rule '" + query + "'" )
+        continue
+
+      body = []
+      if rule.goalName in magicNames :
+        guard = self.getMagicAtom( magicNames[ rule.goalName ], rule.goalAtts, adornments[ rule.goalName ] )
+        body.append( guard )
+        query = query.split( ":-", 1 )
+        query = query[0].strip() + " :- " + guard + ", " + query[1].strip()
+      queryList.append( query )
+
+      for sub in rule.subgoals :
+        if sub[2] :
+          continue
+        if sub[0] in magicNames :
+          magicRule = self.getMagicAtom( magicNames[ sub[0] ], sub[1], adornments[ sub[0] ] )
+          if len( body ) > 0 and body[0] == magicRule :
+            body.append( sub[0] + "(" + ",".join( sub[1] ) + ")" )
+            continue
+          if len( body ) > 0 :
+            magicRule = magicRule + " :- " + ", ".join( body )
+          magicRule = magicRule + " ;"
+          if not magicRule in magicRules :
+            magicRules.append( magicRule )
+        body.append( sub[0] + "(" + ",".join( sub[1] ) + ")" )
+
+    # --------------------------------- #
+    # seed the magic relation of the target
+
+    if rel in magicNames :
+      values = []
+      for i in sorted( adornments[ rel ] ) :
+        value = str( dataTup[ i ] )
+        if self.q.schema[ rel ][ i ] == "string" :
+          value = '"' + value + '"'
+        values.append( value )
+      magicRules.insert( 0, magicNames[ rel ] + "(" + ",".join( values ) + ") ;" )
+
+    for r in magicNames :
+      self.q.schema[ magicNames[ r ] ] = [ self.q.schema[ r ][ i ] for i in sorted( adornments[ r ] ) ]
+
+    self.magic_rules  = set( magicRules )
+    self.q.queryList  = magicRules + queryList
+    self.idb_rules    = None
+    for query in magicRules :
+      logging.debug( "  RUN GOAL DIRECTED : magic rule '" + query + "'" )
+
+    return self.run()
+
+
+  ####################
+  #  GET ADORNMENTS  #
+  ####################
+  # map every idb relation the target rel depends on to the frozenset of its
+  # bound attribute positions. rules maps goal names to their queries.
+  # a relation used with different bindings keeps the positions bound at
+  # every use, so it is restricted by a single magic relation. relations
+  # reached through negated subgoals are evaluated in full, which keeps the
+  # rewritten program stratified.
+  def getAdornments( self, rules, rel, dataTup ) :
+
+    # --------------------------------- #
+    # relations below negated subgoals
+
+    negated  = []
+    reached  = set()
+    worklist = [ rel ]
+    while len( worklist ) > 0 :
+      r = worklist.pop()
+      if r in reached or not r in rules :
+        continue
+      reached.add( r )
+      for query in rules[ r ] :
+        for sub in self.getRule( query ).subgoals :
+          worklist.append( self.getBaseRelation( sub[0] ) )
+          if sub[2] :
+            negated.append( self.getBaseRelation( sub[0] ) )
+
+    adornments = {}
+    worklist   = negated
+    while len( worklist ) > 0 :
+      r = worklist.pop()
+      if r in adornments or not r in rules :
+        continue
+      adornments[ r ] = frozenset()
+      for query in rules[ r ] :
+        for sub in self.getRule( query ).subgoals :
+          worklist.append( self.getBaseRelation( sub[0] ) )
+
+    # --------------------------------- #
+    # pass the bindings sideways
+
+    if not rel in adornments :
+      adornments[ rel ] = frozenset( [ i for i in range( 0, len( dataTup ) ) if str( dataTup[ i ] ) != "_" ] )
+
+    worklist = [ rel ]
+    while len( worklist ) > 0 :
+      r = worklist.pop()
+      for query in rules[ r ] :
+        rule      = self.getRule( query )
+        boundAtts = set( [ rule.goalAtts[ i ] for i in adornments[ r ] ] )
+        for sub in rule.subgoals :
+          if sub[2] :
+            continue
+
+          if sub[0] in rules :
+            bound = []
+            for i in range( 0, len( sub[1] ) ) :
+              att = sub[1][ i ]
+              if not att == "_" and ( att in boundAtts or not self.isVariable( att ) ) :
+                bound.append( i )
+
+            old = adornments.get( sub[0] )
+            new = frozenset( bound )
+            if not old is None :
+              new = old & new
+            if new != old :
+              adornments[ sub[0] ] = new
+              worklist.append( sub[0] )
+
+          for att in sub[1] :
+            if self.isVariable( att ) :
+              boundAtts.add( att )
+
+    logging.debug( "  GET ADORNMENTS : adornments = " + str( adornments ) )
+    return adornments
+
+
+  ####################
+  #  GET MAGIC ATOM  #
+  ####################
+  # e.g. 'magic_a(X)' for the attributes [ 'X', 'Y' ] bound at position 0
+  def getMagicAtom( self, magicRel, atts, positions ) :
+    return magicRel + "(" + ",".join( [ atts[ i ] for i in sorted( positions ) ] ) + ")"
+
+
+  ###############
+  #  SET CACHE  #
+  ###############
+  # keep evaluation results in cacheDir, so run() reuses them for the same
+  # program and database contents. the cache files are bounded by maxSize bytes.
+  def setCache( self, cacheDir, maxSize=ResultsCache.DEFAULT_MAX_SIZE ) :
+    self.results_cache = ResultsCache.ResultsCache( cacheDir, maxSize )
+
+
+  ################
+  #  SAVE CACHE  #
+  ################
+  # store the current evaluation results and their indexes in the cache.
+  # run() saves the results it evaluates. call again to also keep the
+  # indexes built since.
+  def saveCache( self ) :
+
+    if self.results_cache is None or self.cache_key is None :
+      return
+
+    self.results_cache.put( self.cache_key, [ self.final_program, \
+                                              self.final_table_list, \
+                                              self.final_results_array, \
+                                              self.final_results_dict, \
+                                              self.results_indexes ] )
+
+
+  ####################
+  #  INTERN RESULTS  #
+  ####################
+  # intern the strings of the evaluation results and of their indexes again.
+  # unpickled strings are fresh copies, so results read from the cache would
+  # otherwise hold one copy of a value per record instead of sharing the
+  # interned strings of getTupKey.
+  def internResults( self ) :
+
+    for rel in self.final_results_dict :
+      self.final_results_dict[ rel ] = [ tuple( [ intern( v ) for v in tup ] ) for tup in self.final_results_dict[ rel ] ]
+
+    for indexKey in self.results_indexes :
+      index = {}
+      for key, positions in self.results_indexes[ indexKey ].iteritems() :
+        index[ tuple( [ intern( v ) for v in key ] ) ] = positions
+      self.results_indexes[ indexKey ] = index
+
+
+  ###################
+  #  GET CACHE KEY  #
+  ###################
+  # hash the program, including the provenance rules, the schema and the
+  # database contents. returns None if the database cannot be fingerprinted.
+  def getCacheKey( self ) :
+
+    fingerprint = self.getDataFingerprint()
+    if fingerprint is None :
+      logging.debug( "  GET CACHE KEY : no fingerprint for nosql type '" + str( self.nosql_type ) + "', not caching" )
+      return None
+
+    h = hashlib.sha1()
+    h.update( str( self.nosql_type ) + "\n" )
+    for query in self.q.queryList :
+      h.update( query + "\n" )
+    h.update( json.dumps( self.q.schema, sort_keys=True ) + "\n" )
+    h.update( fingerprint )
+
+    return h.hexdigest()
+
+
+  ##########################
+  #  GET DATA FINGERPRINT  #
+  ##########################
+  # return a digest of the database contents, or None if unsupported.
+  def getDataFingerprint( self ) :
+
+    if self.nosql_type == "pickledb" :
+      return hashlib.sha1( json.dumps( self.dbcursor.db, sort_keys=True ) ).hexdigest()
+
+    return None
+
+
   ######################
   #  GET RESULTS DICT  #
   ######################
-  def getResultsDict( self ) :
+  # parse the evaluation results in a single pass.
+  # results may be any iterable of output lines, e.g. the array returned
+  # by Quest.run() or a generator over the evaluator output.
+  # duplicate records are dropped as lines arrive. relations with no
+  # records map to empty lists, data lines before the first relation
+  # header are skipped.
+  def getResultsDict( self, results=None ) :
+
+    if results is None :
+      results = self.final_results_array
 
     results_dict = {}
-    currRelation = None
-    currDataList = []
-    for i in range( 0, len( self.final_results_array ) ) :
-      line = self.final_results_array[ i ]
-      print "line = " + line + ",  currRelation = " + str( currRelation ) + ", currDataList = " + str( currDataList )
+    results_sets = {}
+    currDataList = None
+    currDataSet  = None
+    expectHeader = False
+    for line in results :
 
       # hit a break line
       if "---------------------------" in line :
-        pass
+        expectHeader = True
 
       # hit a relation
-      elif "---------------------------" in self.final_results_array[ i-1 ] :
-        results_dict[ currRelation ] = currDataList
-        currRelation                 = line
-        currDataList                 = []
-
-      # hit the last line of results
-      elif i == len( self.final_results_array ) - 1 :
-        currDataList.append( line )
-        results_dict[ currRelation ] = currDataList
-        currRelation                 = None
-        currDataList                 = []
+      elif expectHeader :
+        currDataList = results_dict.setdefault( line, [] )
+        currDataSet  = results_sets.setdefault( line, set() )
+        expectHeader = False
 
       # hit a data line
-      else :
-        currDataList.append( line )
-
-    # delete the rebel None key
-    del results_dict[ None ]
+      elif not currDataList is None and len( line ) > 0 :
+        tup = self.getTupKey( line )
+        if not tup in currDataSet :
+          currDataList.append( tup )
+          currDataSet.add( tup )
 
     #print results_dict
     return results_dict
 
 
+  ######################
+  #  GET RESULTS SETS  #
+  ######################
+  # map every relation in results_dict to the set of its tuple keys
+  def getResultsSets( self, results_dict ) :
+
+    results_sets = {}
+    for rel in results_dict :
+      results_sets[ rel ] = set( results_dict[ rel ] )
+
+    return results_sets
+
+
   ######################
   #  BUILD PROV QUERY  #
   ######################
   def buildProvQuery( self, query ) :
 
+    rule = self.getRule( query )
+
     # ------------------------------------------ # 
     # get goal name
 
-    goal = self.getGoalName( query )
+    goal = rule.goalName
 
     # ------------------------------------------ # 
     # get body
 
-    body = self.getBody( query )
-
-    # ------------------------------------------ # 
-    # get list of goal attributes
-
-    goalAtts = self.getGoalAtts( query )
+    body = rule.body
 
     # ------------------------------------------ # 
-    # get set of all attributes across subgoals
+    # get set of all attributes across subgoals,
+    # starting with the list of goal attributes
 
-    tmp = query.translate( None, string.whitespace )
-    bodyAttList = tmp.replace( ";", "" )
-    bodyAttList = bodyAttList.split( ":-" )
-    bodyAttList = bodyAttList[1]
-    bodyAttList = bodyAttList.split( ")," )
-
-    finalAttList = goalAtts
+    finalAttList = list( rule.goalAtts )
     #print "finalAttList : " + str( finalAttList )
-    for atts in bodyAttList :
-      atts = atts.split( "(" )
-      atts = atts[1]
-      atts = atts.replace( ")", "" )
-
-      atts = atts.split( "," )
-
-      for att in atts :
+    for sub in rule.subgoals :
+      for att in sub[1] :
         if not att in finalAttList and not att == "_" :
           #print "att = " + att
           finalAttList.append( att )
@@ -714,50 +2750,39 @@ class YProv( object ) :
   #  GET GOAL ATTS  #
   ###################
   def getGoalAtts( self, query ) :
-    tmp      = query.translate( None, string.whitespace )
-    goalAtts = tmp.split( ":-" )
-    goalAtts = goalAtts[0]
-    goalAtts = goalAtts.split( "(" )
-    goalAtts = goalAtts[1]
-    goalAtts = goalAtts.replace( ")", "" )
-    goalAtts = goalAtts.split( "," )
-    return goalAtts
+    return list( self.getRule( query ).goalAtts )
 
 
   ##################
   #  GET SUBGOALS  #
   ##################
   # return list of subgoal names mapped to the list of subgoal attributes
-  # e.g. [['b', ['X', 'Z']], ['c', ['Z', 'Y']]]
+  # and a negation flag
+  # e.g. [['b', ['X', 'Z'], False], [' notin c', ['Z', 'Y'], True]]
   def getSubgoals( self, query ) :
-
-    body        = self.getBody( query )
-    subgoals    = []
-    subgoalList = body.split( ")," )
-
-    for sub in subgoalList :
-      data       = sub.replace( ")", "" )
-      data       = data.split( "(" )
-      subName    = data[0]
-      subAttList = data[1]
-      subAttList = subAttList.split( "," )
-      subgoals.append( [ subName, subAttList ] )
-
-    return subgoals
+    return self.getRule( query ).subgoals
 
 
   ###################
   #  GET GOAL NAME  #
   ###################
   def getGoalName( self, query ) :
+    return self.getRule( query ).goalName
 
-    goalName = query.translate( None, string.whitespace )
-    goalName = goalName.split( ":-" )
-    goalName = goalName[0]
-    goalName = goalName.split( "(" )
-    goalName = goalName[0]
 
-    return goalName
+  ##############
+  #  GET RULE  #
+  ##############
+  # return the compiled Rule for the given query string.
+  # queries are compiled once and cached for the lifetime of the instance.
+  def getRule( self, query ) :
+
+    rule = self.rule_cache.get( query )
+    if rule is None :
+      rule                     = Rule.Rule( query, self.magic_relations )
+      self.rule_cache[ query ] = rule
+
+    return rule
 
 
   ###############
@@ -769,6 +2794,7 @@ class YProv( object ) :
     # --------------------------------- #
     # add original query
     self.q.setQuery( queryStr )
+    self.getRule( queryStr )
     logging.debug( "  SET QUERY : set query '" + queryStr + "'" )
 
 
@@ -780,6 +2806,22 @@ class YProv( object ) :
     return self.q.queryList
 
 
+  ##############################
+  #  SET PROVENANCE RELATIONS  #
+  ##############################
+  # declare the relations whose provenance will be asked for. run() only
+  # builds provenance rules for these relations and the idb relations they
+  # depend on, positively or through negation. the rest of the program is
+  # evaluated without provenance.
+  # None restores provenance rules for every idb relation.
+  def setProvenanceRelations( self, rels ) :
+
+    if rels is None :
+      self.prov_relations = None
+    else :
+      self.prov_relations = list( rels )
+
+
   ################
   #  SET SCHEMA  #
   ################